@@ -0,0 +1,244 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов кэш в файле SQLite (режим WAL).
+
+    LOCATION — путь к файлу. Размер ограничен MAX_ENTRIES: при
+    переполнении удаляются просроченные записи, а затем каждая
+    CULL_FREQUENCY-я из давно не читанных (LRU). incr атомарен между
+    процессами благодаря BEGIN IMMEDIATE."""
+
+    # Как часто (в секундах) обновлять отметку чтения у горячих ключей.
+    ACCESS_RESOLUTION = 10
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _store(self, connection, key, value, timeout, mode):
+        now = time.time()
+        return connection.execute(
+            f'INSERT OR {mode} INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+             self._expiry(timeout), now),
+        )
+
+    def _cull(self, connection):
+        now = time.time()
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (max(count // self._cull_frequency, count - self._max_entries),),
+        )
+
+    def _live_rows(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        return self._connection.execute(
+            'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()),
+        ).fetchall()
+
+    def _touch_accessed(self, rows):
+        now = time.time()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed > self.ACCESS_RESOLUTION
+        ]
+        if not stale:
+            return
+        placeholders = ', '.join('?' * len(stale))
+        try:
+            self._connection.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({placeholders})',
+                (now, *stale),
+            )
+        except sqlite3.OperationalError:
+            # Отметка чтения нужна только для LRU: если файл занят
+            # писателем, чтение не должно из-за неё падать.
+            pass
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = self._store(
+                connection, key, value, timeout, 'IGNORE'
+            ).rowcount > 0
+            if added:
+                self._cull(connection)
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        rows = self._live_rows([key])
+        if not rows:
+            return default
+        self._touch_accessed(rows)
+        return pickle.loads(rows[0][1])
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        rows = []
+        made_keys = list(made)
+        # SQLite ограничивает число параметров в одном запросе.
+        for start in range(0, len(made_keys), 500):
+            rows.extend(self._live_rows(made_keys[start:start + 500]))
+        self._touch_accessed(rows)
+        return {made[key]: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            self._store(connection, key, value, timeout, 'REPLACE')
+            self._cull(connection)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._write() as connection:
+            for key, value in data.items():
+                key = self.make_key(key, version=version)
+                self.validate_key(key)
+                self._store(connection, key, value, timeout, 'REPLACE')
+            self._cull(connection)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self._expiry(timeout), time.time(), key, time.time()),
+            ).rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            return connection.execute(
+                'DELETE FROM cache WHERE key = ?', (key,)
+            ).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        with self._write() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', ((key,) for key in keys)
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._live_rows([key]))
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (made_key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time(),
+                 made_key),
+            )
+        return value
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок потока: переоткрывать файл на каждый
+        # запрос дороже, чем держать его открытым.
+        pass
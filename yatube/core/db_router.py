@@ -0,0 +1,121 @@
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_until'
+
+_state = threading.local()
+
+
+def replica_reads(view_func):
+    """Помечает view, GET-запросы которой можно читать с реплики."""
+    view_func.replica_reads = True
+    return view_func
+
+
+# Только эти приложения читаются с реплик. Сессии, пользователи и
+# служебные таблицы всегда читаются с default: иначе отставшая реплика
+# «разлогинивает» пользователя.
+REPLICA_APPS = {'posts'}
+
+
+def read_from_replica():
+    """Читал ли текущий запрос что-нибудь с реплики."""
+    return getattr(_state, 'used_replica', False)
+
+
+def cache_timeout(timeout):
+    """Срок жизни записи общего кэша, собранной текущим запросом.
+
+    Данные с реплики могут отставать, поэтому такие записи живут не
+    дольше REPLICA_CACHE_TIMEOUT: после записи в базу отставание не
+    задержится в кэше на полный срок."""
+    limit = settings.REPLICA_CACHE_TIMEOUT
+    if read_from_replica() and (timeout is None or timeout > limit):
+        return limit
+    return timeout
+
+
+class ReplicaRouter:
+    """Запись всегда в default, чтение моделей REPLICA_APPS — туда, куда
+    его направил ReplicaMiddleware для текущего запроса."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICA_APPS:
+            return DEFAULT_DB_ALIAS
+        alias = getattr(_state, 'read_db', None)
+        if alias is not None:
+            _state.used_replica = True
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.REPLICA_DATABASES
+
+
+class ReplicaMiddleware:
+    """Отправляет чтение view с replica_reads на случайную реплику.
+
+    После записи в ответ ставится кука PIN_COOKIE: ещё
+    REPLICA_STICKY_SECONDS этот браузер читает с default и видит
+    свой пост или комментарий, даже если реплика отстаёт."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        self.reset()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            self.reset()
+        if wrote:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                PIN_COOKIE,
+                str(int(time.time()) + sticky),
+                max_age=sticky,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def reset(self):
+        _state.read_db, _state.wrote, _state.used_replica = None, False, False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            settings.REPLICA_DATABASES
+            and getattr(view_func, 'replica_reads', False)
+            and request.method in ('GET', 'HEAD')
+            and not self.pinned(request)
+        ):
+            _state.read_db = random.choice(settings.REPLICA_DATABASES)
+
+    def pinned(self, request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def copy_database(target_path, source=DEFAULT_DB_ALIAS):
+    """Снимок базы SQLite в файл через backup API — локальная «реплика»."""
+    connection = connections[source]
+    connection.ensure_connection()
+    target = sqlite3.connect(target_path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+
+User = get_user_model()
+PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size',
+           'cache_size')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест БД: чтение страниц во время публикации постов. '
+        'Пишет в настроенную базу, запускайте на копии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument(
+            '--duration', type=float, default=10, help='Секунд нагрузки'
+        )
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            for pragma in PRAGMAS:
+                cursor.execute(f'PRAGMA {pragma}')
+                row = cursor.fetchone()
+                self.stdout.write(f'{pragma} = {row and row[0]}')
+        author = User.objects.create_user(username='benchmark-author')
+        reader = User.objects.create_user(username='benchmark-reader')
+        self.stats = Counter()
+        self.latencies = []
+        self.lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        url = reverse('posts:profile', args=(author.username,))
+        threads = [
+            threading.Thread(target=self.read, args=(reader, url, deadline))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=self.write, args=(author, deadline))
+            for _ in range(options['writers'])
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            User.objects.filter(pk__in=(author.pk, reader.pk)).delete()
+        self.report(options['duration'])
+
+    def run(self, user, deadline, request, kind):
+        client = Client()
+        client.force_login(user)
+        try:
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    response = request(client)
+                except OperationalError:
+                    self.count(f'{kind}_errors')
+                    continue
+                if response.status_code not in (200, 302):
+                    self.count(f'{kind}_errors')
+                    continue
+                self.count(kind, time.monotonic() - started)
+        finally:
+            connection.close()
+
+    def read(self, user, url, deadline):
+        self.run(user, deadline, lambda client: client.get(url), 'reads')
+
+    def write(self, user, deadline):
+        url = reverse('posts:post_create')
+        self.run(
+            user, deadline,
+            lambda client: client.post(url, {'text': 'benchmark'}),
+            'writes',
+        )
+
+    def count(self, key, elapsed=None):
+        with self.lock:
+            self.stats[key] += 1
+            if key == 'reads':
+                self.latencies.append(elapsed)
+
+    def report(self, duration):
+        stats = self.stats
+        self.stdout.write(
+            f'Чтений: {stats["reads"]} ({stats["reads"] / duration:.1f}/с), '
+            f'ошибок: {stats["reads_errors"]}'
+        )
+        self.stdout.write(
+            f'Записей: {stats["writes"]} '
+            f'({stats["writes"] / duration:.1f}/с), '
+            f'ошибок: {stats["writes_errors"]}'
+        )
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[int(len(latencies) * 0.95)]
+            self.stdout.write(
+                f'Чтение p50: {p50 * 1000:.1f} мс, p95: {p95 * 1000:.1f} мс'
+            )
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db_router import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в файлы реплик для чтения'
+
+    def handle(self, *args, **options):
+        for alias in settings.REPLICA_DATABASES:
+            copy_database(settings.DATABASES[alias]['NAME'])
+            self.stdout.write(f'{alias}: {settings.DATABASES[alias]["NAME"]}')
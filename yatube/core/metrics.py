@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class SharedCounters:
+    """Счётчики в общем кэше, общие для всех процессов.
+
+    Приращения копятся в памяти процесса и сбрасываются в кэш не чаще
+    раза в METRICS_FLUSH_INTERVAL секунд: запись в кэш на каждый запрос
+    стоила бы дороже самого счёта."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+
+    def key(self, name):
+        return f'{self.prefix}:{name}'
+
+    def incr(self, name, delta=1):
+        with self._lock:
+            self._pending[name] += delta
+            due = (
+                time.monotonic() - self._flushed
+                >= settings.METRICS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed = time.monotonic()
+        for name, delta in pending.items():
+            key = self.key(name)
+            if cache.add(key, delta, timeout=None):
+                continue
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                cache.set(key, delta, timeout=None)
+
+    def read(self, *names):
+        """Сбрасывает свой буфер и возвращает значения всех процессов."""
+        self.flush()
+        values = cache.get_many([self.key(name) for name in names])
+        return {name: values.get(self.key(name), 0) for name in names}
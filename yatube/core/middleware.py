@@ -0,0 +1,54 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import page_cache
+from .db_router import cache_timeout
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэширует ответы view, помеченных anonymous_cache, для анонимов.
+
+    Каждая страница запоминается под своими surrogate-ключами
+    (post:<id>, group:<slug>, author:<username>), по которым её
+    сбрасывают сигналы моделей."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.surrogate_keys = set()
+        response = self.get_response(request)
+        timeout = getattr(request, 'page_cache_timeout', None)
+        if (
+            timeout is not None
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            page_cache.store(request, response, cache_timeout(timeout))
+            response['X-Page-Cache'] = 'MISS'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timeout = getattr(view_func, 'page_cache_timeout', None)
+        if (
+            timeout is None
+            or request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+        ):
+            return None
+        response = page_cache.lookup(request)
+        page_cache.record(hit=response is not None)
+        if response is None:
+            request.page_cache_timeout = timeout
+            return None
+        response['X-Page-Cache'] = 'HIT'
+        last_modified = response.get('Last-Modified')
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=last_modified and parse_http_date_safe(
+                last_modified
+            ),
+            response=response,
+        )
@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+
+from .metrics import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+counters = SharedCounters('page_cache')
+
+PAGE_KEY = 'page:{}'
+SURROGATE_KEY = 'surrogates:{}'
+LOCK_KEY = 'lock:{}'
+CHANGED_KEY = 'changed:{}'
+# Параметры, которые читают кэшируемые view: остальные на ответ не
+# влияют и не должны плодить копии страницы.
+PAGE_PARAMS = ('cursor', 'page')
+
+
+def anonymous_cache(timeout=None):
+    """Помечает view как кэшируемую целиком для анонимных GET-запросов."""
+    def decorator(view_func):
+        view_func.page_cache_timeout = (
+            settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout
+        )
+        return view_func
+    return decorator
+
+
+def add_surrogate_keys(request, *keys):
+    if hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys.update(keys)
+
+
+def _digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def page_url(request):
+    params = [
+        (name, request.GET[name])
+        for name in PAGE_PARAMS if name in request.GET
+    ]
+    return f'{request.path}?{urlencode(params)}'
+
+
+def page_key(request):
+    return PAGE_KEY.format(_digest(page_url(request)))
+
+
+def surrogate_key(surrogate):
+    return SURROGATE_KEY.format(_digest(surrogate))
+
+
+def changed_key(surrogate):
+    return CHANGED_KEY.format(_digest(surrogate))
+
+
+def mark_changed(*surrogates):
+    now = time.time()
+    cache.set_many(
+        {changed_key(surrogate): now for surrogate in surrogates},
+        timeout=None,
+    )
+
+
+def last_changed(*surrogates):
+    keys = [changed_key(surrogate) for surrogate in surrogates]
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        # Отметка вытеснена или ещё не ставилась: считаем, что страница
+        # изменилась сейчас, иначе клиент мог бы получить 304 на старое.
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        stamps.update(cache.get_many(missing))
+    return max(stamps.values())
+
+
+def conditional(surrogates_func):
+    """ETag и Last-Modified по отметкам изменения surrogate-ключей.
+
+    surrogates_func(request, *args, **kwargs) возвращает ключи страницы
+    (или None, если объекта нет). 304 отдаётся до запросов view и
+    рендера шаблона."""
+    def changed(request, *args, **kwargs):
+        if not hasattr(request, 'page_changed'):
+            surrogates = surrogates_func(request, *args, **kwargs)
+            request.page_changed = (
+                last_changed(*surrogates) if surrogates else None
+            )
+        return request.page_changed
+
+    def etag(request, *args, **kwargs):
+        stamp = changed(request, *args, **kwargs)
+        if stamp is None:
+            return None
+        return _digest(
+            f'{request.user.pk}|{page_url(request)}|{stamp!r}'
+        )
+
+    def last_modified(request, *args, **kwargs):
+        stamp = changed(request, *args, **kwargs)
+        if stamp is None:
+            return None
+        return datetime.fromtimestamp(stamp, timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _tag(surrogate, key, timeout):
+    """Добавляет страницу в индекс surrogate-ключа под блокировкой.
+
+    Индекс живёт не меньше самой долгоживущей своей страницы: иначе он
+    истечёт раньше неё, и purge() её не найдёт. Возвращает False, если
+    блокировку взять не удалось."""
+    index_key = surrogate_key(surrogate)
+    lock_key = LOCK_KEY.format(index_key)
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    try:
+        now = time.time()
+        pages, expires = cache.get(index_key) or (set(), 0)
+        pages.add(key)
+        expires = max(expires, now + timeout)
+        cache.set(index_key, (pages, expires), expires - now)
+    finally:
+        cache.delete(lock_key)
+    return True
+
+
+def store(request, response, timeout):
+    """Кладёт страницу в кэш, только если она попала во все индексы:
+    страницу, которую нельзя сбросить, лучше не кэшировать."""
+    key = page_key(request)
+    for surrogate in request.surrogate_keys:
+        if not _tag(surrogate, key, timeout):
+            logger.warning('page cache: %s not stored, %s busy', key,
+                           surrogate)
+            return False
+    cache.set(key, (response, sorted(request.surrogate_keys)), timeout)
+    return True
+
+
+def lookup(request):
+    """Страница из кэша или None.
+
+    Вместе со страницей читаются её индексы: чтение освежает их отметку
+    доступа, и при вытеснении они не уходят раньше горячей страницы. Если
+    индекс всё же вытеснен, purge() страницу уже не найдёт, поэтому она
+    удаляется и собирается заново."""
+    key = page_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    response, surrogates = entry
+    index_keys = [surrogate_key(surrogate) for surrogate in surrogates]
+    if len(cache.get_many(index_keys)) < len(index_keys):
+        cache.delete(key)
+        return None
+    return response
+
+
+def purge(*surrogates):
+    index_keys = [surrogate_key(surrogate) for surrogate in surrogates]
+    pages = set()
+    for tagged, _ in cache.get_many(index_keys).values():
+        pages.update(tagged)
+    cache.delete_many(list(pages) + index_keys)
+    mark_changed(*surrogates)
+    logger.debug('page cache purge %s: %s pages', surrogates, len(pages))
+
+
+def record(hit):
+    counters.incr('hits' if hit else 'misses')
+
+
+def stats():
+    values = counters.read('hits', 'misses')
+    hits, misses = values['hits'], values['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
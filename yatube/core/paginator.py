@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def table_estimate(queryset):
+    """Число строк таблицы из статистики ANALYZE (sqlite_stat1) или None.
+
+    Статистику обновляют PRAGMA optimize при закрытии соединения
+    (core.sqlite) и ANALYZE в конце reconcile_counters; без них оценка
+    отстаёт от таблицы или отсутствует."""
+    table = queryset.model._meta.db_table
+    try:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                (table,),
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц в админке без точного COUNT(*).
+
+    Без фильтров число строк берётся из статистики ANALYZE, иначе
+    считается не дальше ADMIN_COUNT_LIMIT строк."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and not queryset.query.distinct:
+            estimate = table_estimate(queryset)
+            if estimate is not None:
+                return estimate
+        return queryset[:settings.ADMIN_COUNT_LIMIT].count()
@@ -0,0 +1,32 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """sqlite3 с PRAGMA из OPTIONS['pragmas'] на каждом новом соединении.
+
+    journal_mode=WAL даёт читателям работать во время записи,
+    busy_timeout — ждать блокировку вместо «database is locked».
+    Перед закрытием соединения выполняется PRAGMA optimize: он
+    обновляет статистику sqlite_stat1 для таблиц, где она устарела."""
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.execute('PRAGMA optimize')
+            except base.Database.Error:
+                # База занята или только для чтения: статистика
+                # обновится при закрытии другого соединения.
+                pass
+        super()._close()
@@ -0,0 +1,41 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под именем из SHA-256 его содержимого.
+
+    Одинаковые загрузки получают одно имя и один файл на диске (а значит,
+    и общие миниатюры sorl). Повторная запись только обновляет mtime:
+    по нему удаление не трогает только что переиспользованный файл."""
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        # Пишем во временный файл и атомарно переименовываем: при гонке
+        # двух одинаковых загрузок содержимое всё равно одно и то же.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+
+def incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class TestCacheLocationTests(SimpleTestCase):
+    def test_tests_do_not_touch_working_cache(self):
+        """Тесты пишут в отдельный файл кэша, а не в рабочий"""
+
+        location = settings.CACHES['default']['LOCATION']
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+        self.assertNotEqual(
+            location, os.path.join(settings.BASE_DIR, 'cache.sqlite3')
+        )
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """Контракт кэш-бэкенда Django для SQLiteCache."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_simple(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('addkey', 'value'))
+        self.assertFalse(self.cache.add('addkey', 'new value'))
+        self.assertEqual(self.cache.get('addkey'), 'value')
+
+    def test_add_replaces_expired(self):
+        self.cache.set('key', 'old', timeout=0)
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_get_many(self):
+        self.cache.set_many({'a': 'a', 'b': 'b', 'c': 'c'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'c', 'd']), {'a': 'a', 'c': 'c'}
+        )
+        self.assertEqual(self.cache.get_many([]), {})
+
+    def test_delete(self):
+        self.cache.set_many({'key1': 'spam', 'key2': 'eggs'})
+        self.assertTrue(self.cache.delete('key1'))
+        self.assertFalse(self.cache.delete('key1'))
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertEqual(self.cache.get('key2'), 'eggs')
+
+    def test_delete_many(self):
+        self.cache.set_many({'key1': 1, 'key2': 2, 'key3': 3})
+        self.cache.delete_many(['key1', 'key2'])
+        self.assertEqual(self.cache.get_many(['key1', 'key2', 'key3']),
+                         {'key3': 3})
+
+    def test_has_key(self):
+        self.cache.set('hello', 'goodbye')
+        self.assertTrue(self.cache.has_key('hello'))
+        self.assertFalse(self.cache.has_key('goodbye'))
+        self.cache.set('none', None)
+        self.assertTrue(self.cache.has_key('none'))
+
+    def test_incr_decr(self):
+        self.cache.set('answer', 41)
+        self.assertEqual(self.cache.incr('answer'), 42)
+        self.assertEqual(self.cache.incr('answer', 10), 52)
+        self.assertEqual(self.cache.decr('answer', 12), 40)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        with self.assertRaises(ValueError):
+            self.cache.decr('missing')
+
+    def test_data_types(self):
+        values = {
+            'string': 'это строка',
+            'int': 42,
+            'list': [1, 2, 3],
+            'dict': {'a': 1},
+            'bytes': b'\x00\xff',
+            'none': None,
+        }
+        for key, value in values.items():
+            with self.subTest(key=key):
+                self.cache.set(key, value)
+                self.assertEqual(self.cache.get(key, 'default'), value)
+
+    def test_expiration(self):
+        self.cache.set('expire', 'value', timeout=1)
+        self.cache.set('forever', 'value', timeout=None)
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get('expire'))
+        self.assertFalse(self.cache.has_key('expire'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_zero_timeout(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_touch(self):
+        self.cache.set('key', 'value', timeout=1)
+        self.assertTrue(self.cache.touch('key', timeout=None))
+        time.sleep(1.1)
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertFalse(self.cache.touch('missing'))
+
+    def test_versions(self):
+        self.cache.set('answer', 37, version=1)
+        self.cache.set('answer', 42, version=2)
+        self.assertEqual(self.cache.get('answer', version=1), 37)
+        self.assertEqual(self.cache.get('answer', version=2), 42)
+        self.assertEqual(self.cache.incr_version('answer', version=2), 3)
+        self.assertEqual(self.cache.get('answer', version=3), 42)
+
+    def test_clear(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_shared_between_instances(self):
+        """Второй экземпляр (как другой воркер) видит те же данные"""
+
+        self.cache.set('shared', 'value')
+        self.assertEqual(self.make_cache().get('shared'), 'value')
+        self.make_cache().delete('shared')
+        self.assertIsNone(self.cache.get('shared'))
+
+    def test_cull_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.ACCESS_RESOLUTION = 0
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        time.sleep(0.01)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertLessEqual(
+            len(cache.get_many(f'key{i}' for i in range(11))), 10
+        )
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertEqual(cache.get('key10'), 10)
+        self.assertIsNone(cache.get('key1'))
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=incr_many, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
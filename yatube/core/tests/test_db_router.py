@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import page_cache
+from core.db_router import PIN_COOKIE, copy_database
+from posts import caching
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """Чтение с реплики и чтение своих записей с основной базы."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Старый пост')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        copy_database(path)
+        connections.databases['replica'] = {
+            **settings.DATABASES['default'], 'NAME': path,
+        }
+        self.addCleanup(self.drop_replica)
+        replicas = override_settings(REPLICA_DATABASES=['replica'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        self.client = Client()
+        self.client.force_login(self.author)
+        # Запись выше ещё не дошла до «реплики».
+        Post.objects.create(author=self.author, text='Новый пост')
+        cache.clear()
+
+    def drop_replica(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+
+    def profile_texts(self, client):
+        response = client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        return [post.text for post in response.context['page_obj']]
+
+    def test_reads_go_to_replica(self):
+        """Лента профиля читается с реплики, которая отстаёт"""
+
+        self.assertEqual(self.profile_texts(Client()), ['Старый пост'])
+
+    def test_writes_go_to_primary(self):
+        """Запись идёт в основную базу и закрепляет за ней автора"""
+
+        response = self.client.post(
+            reverse('posts:post_create'), data={'text': 'Свой пост'}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(Post.objects.filter(text='Свой пост').exists())
+        self.assertFalse(
+            Post.objects.using('replica').filter(text='Свой пост').exists()
+        )
+        cache.clear()
+        self.assertEqual(
+            self.profile_texts(self.client),
+            ['Свой пост', 'Новый пост', 'Старый пост'],
+        )
+
+    def test_pin_expires(self):
+        """Просроченная кука возвращает чтение на реплику"""
+
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertEqual(self.profile_texts(self.client), ['Старый пост'])
+
+    def test_without_replicas_reads_primary(self):
+        """Без настроенных реплик всё читается с основной базы"""
+
+        with self.settings(REPLICA_DATABASES=[]):
+            self.assertEqual(
+                self.profile_texts(Client()), ['Новый пост', 'Старый пост']
+            )
+
+    def test_sessions_read_from_primary(self):
+        """Сессия, которой ещё нет на реплике, не делает пользователя
+        анонимом"""
+
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('posts:index'))
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertNotIn('X-Page-Cache', response)
+
+    @override_settings(REPLICA_CACHE_TIMEOUT=1)
+    def test_replica_reads_cached_briefly(self):
+        """Ответы с реплики заполняют общие кэши, но ненадолго"""
+
+        url = reverse('posts:index')
+        response = Client().get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(Client().get(url)['X-Page-Cache'], 'HIT')
+        post = Post.objects.get(text='Старый пост')
+        self.assertIsNotNone(
+            cache.get(caching.card_key(post, caching.generation('cards')))
+        )
+        self.assertIsNotNone(
+            cache.get(f'feed:index:{caching.generation()}:None')
+        )
+        time.sleep(1.1)
+        self.assertIsNone(
+            cache.get(page_cache.page_key(response.wsgi_request))
+        )
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core.metrics import SharedCounters
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=60)
+class SharedCountersTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_increments_buffered_until_flush(self):
+        """Приращения не пишутся в кэш на каждый вызов"""
+
+        counters = SharedCounters('test')
+        for _ in range(3):
+            counters.incr('hits')
+        self.assertIsNone(cache.get(counters.key('hits')))
+        counters.flush()
+        self.assertEqual(cache.get(counters.key('hits')), 3)
+
+    def test_read_sums_all_processes(self):
+        """Чтение складывает счётчики всех процессов"""
+
+        first, second = SharedCounters('test'), SharedCounters('test')
+        first.incr('hits', 2)
+        first.flush()
+        second.incr('hits')
+        self.assertEqual(second.read('hits', 'misses'),
+                         {'hits': 3, 'misses': 0})
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_flushes_after_interval(self):
+        """По истечении интервала буфер сбрасывается сам"""
+
+        counters = SharedCounters('test')
+        counters.incr('hits')
+        self.assertEqual(cache.get(counters.key('hits')), 1)
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.sqlite.base import DatabaseWrapper
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    """PRAGMA профиля SQLite на новых соединениях."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_dict = {
+            **settings.DATABASES['default'],
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        }
+        self.wrapper = DatabaseWrapper(settings_dict)
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Каждое новое соединение получает PRAGMA из OPTIONS"""
+
+        expected = {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'busy_timeout': 20000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'temp_store': 2,
+        }
+        for name, value in expected.items():
+            with self.subTest(pragma=name):
+                self.assertEqual(self.pragma(name), value)
+
+    def test_pragmas_not_passed_to_driver(self):
+        """pragmas не уходит в sqlite3.connect"""
+
+        self.assertNotIn('pragmas', self.wrapper.get_connection_params())
+
+    def test_optimize_on_close(self):
+        """Закрытие соединения обновляет статистику sqlite_stat1"""
+
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, n)')
+            cursor.execute('CREATE INDEX item_n ON item (n)')
+            cursor.executemany(
+                'INSERT INTO item (n) VALUES (%s)',
+                [(i % 10,) for i in range(1000)],
+            )
+            cursor.execute('SELECT id FROM item WHERE n = 3')
+        self.wrapper.close()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = 'item'"
+            )
+            self.assertEqual(cursor.fetchone()[0].split()[0], '1000')
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    def test_benchmark_reports_throughput(self):
+        """benchmark_db печатает PRAGMA и пропускную способность"""
+
+        out = StringIO()
+        call_command(
+            'benchmark_db', readers=1, writers=1, duration=0.5, stdout=out
+        )
+        self.assertIn('busy_timeout = 20000', out.getvalue())
+        self.assertIn('Чтений:', out.getvalue())
+        connection.close()
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storages import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    """Хранилище, адресующее файлы по содержимому."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def test_name_is_content_hash(self):
+        """Имя файла — SHA-256 содержимого с исходным расширением"""
+
+        name = self.storage.save('posts/meme.JPG', ContentFile(b'meme'))
+        digest = hashlib.sha256(b'meme').hexdigest()
+        self.assertEqual(name, f'posts/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'meme')
+
+    def test_same_content_stored_once(self):
+        """Повторная загрузка того же файла переиспользует его"""
+
+        first = self.storage.save('posts/a.jpg', ContentFile(b'meme'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'meme'))
+        other = self.storage.save('posts/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [
+            name for _, _, names in os.walk(self.directory)
+            for name in names
+        ]
+        self.assertEqual(len(files), 2)
+
+    def test_reuse_refreshes_mtime(self):
+        """Переиспользование обновляет время изменения файла"""
+
+        name = self.storage.save('posts/a.jpg', ContentFile(b'meme'))
+        os.utime(self.storage.path(name), (0, 0))
+        self.storage.save('posts/b.jpg', ContentFile(b'meme'))
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), 0)
@@ -1,9 +1,64 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import transaction
+from django.shortcuts import render
+from django.utils import timezone
 
-from .models import Group, Post, Comment
+from core import page_cache
+from core.paginator import EstimatedCountPaginator
 
+from . import caching, search
+from .models import Comment, Group, Post, UserDeletion
 
-class PostAdmin(admin.ModelAdmin):
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class MoveToGroupForm(forms.Form):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        help_text='Пустое значение убирает посты из групп.',
+        widget=AutocompleteSelect(
+            Post._meta.get_field('group').remote_field, admin.site
+        ),
+    )
+
+
+def move_to_group(queryset, group, batch_size=500):
+    """Переносит посты пачками UPDATE по pk и сбрасывает их кэши
+    вручную: queryset.update не отправляет сигналы моделей."""
+    queryset = queryset.order_by('pk')
+    moved, last = 0, 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last).values_list(
+            'pk', 'author__username', 'group__slug'
+        )[:batch_size])
+        if not rows:
+            break
+        last = rows[-1][0]
+        with transaction.atomic():
+            moved += Post.objects.filter(
+                pk__in=[pk for pk, _, _ in rows]
+            ).update(group=group, updated=timezone.now())
+        surrogates = set()
+        for pk, username, slug in rows:
+            surrogates.update((f'post:{pk}', f'author:{username}'))
+            if slug:
+                surrogates.add(f'group:{slug}')
+        page_cache.purge(*surrogates)
+    caching.bump()
+    page_cache.purge('index', *([f'group:{group.slug}'] if group else []))
+    return moved
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -11,12 +66,66 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    actions = ('move_to_group',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_matching(queryset, search_term), False
+
+    def move_to_group(self, request, queryset):
+        form = MoveToGroupForm(
+            request.POST if 'apply' in request.POST else None
+        )
+        if form.is_valid():
+            moved = move_to_group(queryset, form.cleaned_data['group'])
+            self.message_user(
+                request, f'Перенесено постов: {moved}', messages.SUCCESS
+            )
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Перенос постов в группу',
+            'opts': self.model._meta,
+            'form': form,
+            'media': self.media + form.media,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'select_across': request.POST.get('select_across', '0'),
+        }
+        return render(
+            request, 'admin/posts/post/move_to_group.html', context
+        )
+
+    move_to_group.short_description = 'Перенести в группу'
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'created', 'post', 'author')
+    list_select_related = ('post', 'author')
+    date_hierarchy = 'created'
+    raw_id_fields = ('post', 'author')
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class UserDeletionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'stage', 'deleted', 'created')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(UserDeletion, UserDeletionAdmin)
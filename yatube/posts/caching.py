@@ -0,0 +1,169 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from core.db_router import cache_timeout
+
+from . import thumbnails
+
+GENERATION_KEY = 'generation:{}'
+
+
+def _fresh_generation():
+    # Начинаем с текущего времени, чтобы после вытеснения счётчика
+    # из кэша поколение не вернулось к уже использованному значению.
+    return int(time.time() * 1000)
+
+
+def generation(scope='posts'):
+    key = GENERATION_KEY.format(scope)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _fresh_generation(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump(scope='posts'):
+    key = GENERATION_KEY.format(scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        value = _fresh_generation()
+        cache.set(key, value, timeout=None)
+        return value
+
+
+def card_key(post, cards_generation):
+    stamp = post.updated.timestamp()
+    return f'post_card:{post.pk}:{stamp}:{cards_generation}'
+
+
+def render_cards(posts):
+    posts = list(posts)
+    cards_generation = generation('cards')
+    keys = [card_key(post, cards_generation) for post in posts]
+    cached = cache.get_many(keys)
+    to_render = {
+        key: post for key, post in zip(keys, posts) if key not in cached
+    }
+    thumbnails.attach_pictures(to_render.values())
+    missing = {
+        key: render_to_string('posts/includes/post_card.html', {'post': post})
+        for key, post in to_render.items()
+    }
+    if missing:
+        cache.set_many(
+            missing, cache_timeout(settings.POST_CARD_CACHE_TIMEOUT)
+        )
+    cached.update(missing)
+    return [cached[key] for key in keys]
+
+
+class TwoTierCache:
+    """Кэш для горячих ключей лент: локальный LRU процесса перед общим
+    кэшем default.
+
+    Значение пересчитывает только тот, кто взял блокировку (cache.add),
+    остальные в это время получают устаревшее значение. Пересчёт
+    начинается заранее с вероятностью, растущей к концу срока жизни
+    (XFetch: чем дольше считается значение, тем раньше)."""
+
+    def __init__(self, size, local_timeout, lock_timeout, stale_timeout,
+                 beta=1.0):
+        self.size = size
+        self.local_timeout = local_timeout
+        self.lock_timeout = lock_timeout
+        self.stale_timeout = stale_timeout
+        self.beta = beta
+        self.stats = Counter()
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _local_get(self, key, now):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            local_expires, envelope = item
+            if local_expires <= now:
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return envelope
+
+    def _local_set(self, key, envelope, now):
+        with self._lock:
+            self._local[key] = (now + self.local_timeout, envelope)
+            self._local.move_to_end(key)
+            while len(self._local) > self.size:
+                self._local.popitem(last=False)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def _needs_refresh(self, envelope, now):
+        _, expires, delta = envelope
+        return now - delta * self.beta * math.log(random.random()) >= expires
+
+    def _compute(self, key, compute, timeout):
+        started = time.monotonic()
+        value = compute()
+        timeout = cache_timeout(timeout)
+        delta = time.monotonic() - started
+        now = time.time()
+        envelope = (value, now + timeout, delta)
+        cache.set(key, envelope, timeout + self.stale_timeout)
+        self._local_set(key, envelope, now)
+        self.stats['recomputed'] += 1
+        return value
+
+    def get_or_set(self, key, compute, timeout):
+        now = time.time()
+        envelope = self._local_get(key, now)
+        if envelope is not None:
+            self.stats['local_hits'] += 1
+        else:
+            envelope = cache.get(key)
+            if envelope is not None:
+                self.stats['shared_hits'] += 1
+                self._local_set(key, envelope, now)
+        if envelope is not None and not self._needs_refresh(envelope, now):
+            return envelope[0]
+        lock_key = f'lock:{key}'
+        if cache.add(lock_key, 1, self.lock_timeout):
+            try:
+                return self._compute(key, compute, timeout)
+            finally:
+                cache.delete(lock_key)
+        if envelope is not None:
+            self.stats['stale_served'] += 1
+            return envelope[0]
+        return self._wait(key, lock_key, compute, timeout)
+
+    def _wait(self, key, lock_key, compute, timeout):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            envelope = cache.get(key)
+            if envelope is not None:
+                self.stats['waited'] += 1
+                return envelope[0]
+            if not cache.has_key(lock_key):
+                break
+        return self._compute(key, compute, timeout)
+
+
+feed_cache = TwoTierCache(
+    size=settings.FEED_LOCAL_CACHE_SIZE,
+    local_timeout=settings.FEED_LOCAL_CACHE_TIMEOUT,
+    lock_timeout=settings.FEED_CACHE_LOCK_TIMEOUT,
+    stale_timeout=settings.FEED_CACHE_STALE_TIMEOUT,
+)
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import timeline
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def increment_user(user_id, field, delta=1):
+    updated = _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        reconcile_users(user_id, user_id)
+
+
+def increment_comments(post_id, delta=1):
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _user_totals(first_pk, last_pk):
+    return UserStats.objects.filter(
+        user_id__gte=first_pk,
+        user_id__lte=last_pk,
+    ).annotate(
+        actual_posts=_count(Post.objects.all(), 'author'),
+        actual_followers=_count(Follow.objects.all(), 'author'),
+        actual_following=_count(Follow.objects.all(), 'user'),
+    )
+
+
+def ensure_users(first_pk, last_pk):
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk) for pk in User.objects.filter(
+                pk__gte=first_pk,
+                pk__lte=last_pk,
+                stats__isnull=True,
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def reconcile_users(first_pk, last_pk):
+    """Пересчитывает счётчики пользователей с pk в [first_pk, last_pk],
+    возвращает число исправленных строк."""
+    fixed = 0
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    for stats in _user_totals(first_pk, last_pk):
+        actual = (
+            stats.actual_posts, stats.actual_followers, stats.actual_following
+        )
+        stored = (
+            stats.posts_count, stats.followers_count, stats.following_count
+        )
+        if actual != stored:
+            UserStats.objects.filter(pk=stats.pk).update(
+                posts_count=stats.actual_posts,
+                followers_count=stats.actual_followers,
+                following_count=stats.actual_following,
+            )
+            fixed += 1
+            if stats.followers_count > threshold >= stats.actual_followers:
+                timeline.backfill_followers(stats.pk)
+    return fixed
+
+
+def reconcile_posts(first_pk, last_pk):
+    drifted = Post.objects.filter(
+        pk__gte=first_pk,
+        pk__lte=last_pk,
+    ).annotate(
+        actual=_count(Comment.objects.all(), 'post'),
+    ).exclude(comments_count=F('actual')).values_list('pk', 'actual')
+    fixed = 0
+    for pk, actual in drifted:
+        Post.objects.filter(pk=pk).update(comments_count=actual)
+        fixed += 1
+    return fixed
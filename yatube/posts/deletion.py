@@ -0,0 +1,101 @@
+import logging
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F, Q
+
+from core import page_cache
+
+from . import caching
+from .models import (Comment, Follow, Post, TimelineEntry, User,
+                     UserDeletion)
+from .signals import batched_invalidation
+
+logger = logging.getLogger(__name__)
+
+# Что удалять на каждом этапе. Чужие комментарии к постам и записи лент
+# удаляются раньше постов, чтобы каскад от поста оставался маленьким.
+STAGES = {
+    'comments': lambda user_id: Comment.objects.filter(author_id=user_id),
+    'post_comments': lambda user_id: Comment.objects.filter(
+        post__author_id=user_id
+    ),
+    'follows': lambda user_id: Follow.objects.filter(
+        Q(user_id=user_id) | Q(author_id=user_id)
+    ),
+    'timeline': lambda user_id: TimelineEntry.objects.filter(
+        user_id=user_id
+    ),
+    'post_timeline': lambda user_id: TimelineEntry.objects.filter(
+        post__author_id=user_id
+    ),
+    'posts': lambda user_id: Post.objects.filter(author_id=user_id),
+}
+
+
+def schedule(user):
+    """Сразу закрывает вход и профиль пользователя; данные удалит
+    воркер process_deletions."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            is_active=False, password=make_password(None)
+        )
+        deletion, _ = UserDeletion.objects.get_or_create(user=user)
+    # Посты и комментарии пропадают со всех страниц. Ленты помечены
+    # ключами post:<pk>, но условный GET группы смотрит только на group:.
+    posts = Post.objects.filter(author=user).order_by()
+    slugs = posts.filter(group__isnull=False).values_list(
+        'group__slug', flat=True
+    ).distinct()
+    commented = Comment.objects.filter(author=user).order_by().values_list(
+        'post_id', flat=True
+    ).distinct()
+    keys = ['index', f'author:{user.username}']
+    keys += [f'group:{slug}' for slug in slugs]
+    keys += [f'post:{pk}' for pk in posts.values_list('pk', flat=True)]
+    keys += [f'comments:{pk}' for pk in commented]
+    caching.bump()
+    page_cache.purge(*keys)
+    return deletion
+
+
+def step(deletion, batch_size):
+    """Удаляет одну пачку строк текущего этапа в своей транзакции.
+
+    Сигналы моделей обновляют счётчики, ленты и картинки постов вместе
+    с пачкой, а кэши сбрасываются один раз на всю пачку. Возвращает
+    число удалённых строк; когда этапы пройдены, удаляет самого
+    пользователя."""
+    for stage in UserDeletion.STAGES[
+        UserDeletion.STAGES.index(deletion.stage):
+    ]:
+        queryset = STAGES[stage](deletion.user_id)
+        ids = list(queryset.order_by('pk').values_list(
+            'pk', flat=True
+        )[:batch_size])
+        if not ids:
+            continue
+        with transaction.atomic(), batched_invalidation():
+            queryset.model.objects.filter(pk__in=ids).delete()
+            UserDeletion.objects.filter(pk=deletion.pk).update(
+                stage=stage, deleted=F('deleted') + len(ids)
+            )
+        deletion.stage = stage
+        deletion.deleted += len(ids)
+        return len(ids)
+    with transaction.atomic(), batched_invalidation():
+        User.objects.filter(pk=deletion.user_id).delete()
+    # Строки очереди больше нет: последний этап отмечаем только в памяти.
+    deletion.stage = 'user'
+    deletion.deleted += 1
+    logger.info('user %s deleted, %s rows', deletion.user_id, deletion.deleted)
+    return 1
+
+
+def process(batch_size):
+    deletion = UserDeletion.objects.select_related('user').order_by(
+        'created'
+    ).first()
+    if deletion is None:
+        return None, 0
+    return deletion, step(deletion, batch_size)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from .images import process_upload
 from .models import Comment, Post
 
 
@@ -12,6 +14,12 @@ class PostForm(ModelForm):
             'text': forms.Textarea(attrs={'cols': 70, 'rows': 15}),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return process_upload(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
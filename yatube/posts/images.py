@@ -0,0 +1,124 @@
+import math
+import os
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+from sorl.thumbnail.images import ImageFile
+
+from . import thumbnails
+from .models import Post
+
+ORIENTATION = 0x0112
+
+
+def target_size(width, height):
+    """Наименьший размер с теми же пропорциями, из которого ещё можно
+    вырезать самый большой вариант картинки поста."""
+    crop_width, crop_height = settings.POST_IMAGE_CROP
+    box_width = max(settings.POST_IMAGE_WIDTHS)
+    box_height = math.ceil(box_width * crop_height / crop_width)
+    scale = max(box_width / width, box_height / height)
+    if scale >= 1:
+        return width, height
+    return math.ceil(width * scale), math.ceil(height * scale)
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    ):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode == 'RGB':
+        return image
+    return image.convert('RGB')
+
+
+def _reencode(image):
+    width, height = image.size
+    # Уменьшенное декодирование (draft) есть только у JPEG, остальные
+    # форматы целиком разворачиваются в память.
+    limit = settings.POST_IMAGE_MAX_PIXELS if image.format == 'JPEG' else (
+        settings.POST_IMAGE_MAX_DECODED_PIXELS
+    )
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': limit // 10 ** 6},
+        )
+    orientation = image.getexif().get(ORIENTATION, 1)
+    # При таких значениях EXIF-ориентации картинка повернётся на 90°.
+    rotated = orientation in (5, 6, 7, 8)
+    if rotated:
+        width, height = height, width
+    size = target_size(width, height)
+    # JPEG декодируется сразу в 1/2, 1/4 или 1/8 размера, не меньше
+    # size: полноразмерный растр в памяти не появляется.
+    image.draft('RGB', size[::-1] if rotated else size)
+    if orientation != 1:
+        image = ImageOps.exif_transpose(image)
+    image = _to_rgb(image)
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        'JPEG',
+        quality=settings.POST_IMAGE_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+    return buffer.getvalue()
+
+
+def process_upload(upload):
+    """Проверяет загруженную картинку до декодирования и пересохраняет её
+    прогрессивным JPEG без EXIF, не больше, чем нужно для вариантов."""
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            content = _reencode(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        # Обрезанный файл проходит verify() поля формы, но падает при
+        # декодировании растра.
+        raise ValidationError(
+            'Файл повреждён или не является картинкой.',
+            code='invalid_image',
+        )
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        f'{name}.jpg', content, content_type='image/jpeg'
+    )
+
+
+def release(name):
+    """Удаляет файл картинки и его миниатюры, если на него больше не
+    ссылается ни один пост."""
+    if not name or Post.objects.filter(image=name).exists():
+        return False
+    storage = Post._meta.get_field('image').storage
+    try:
+        if not storage.exists(name):
+            return False
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: это не наш файл.
+        return False
+    age = time.time() - os.path.getmtime(storage.path(name))
+    if age < settings.MEDIA_BLOB_GRACE_PERIOD:
+        # Файл только что переиспользовала новая загрузка, пост которой
+        # ещё не сохранён; такие файлы позже подберёт gc_media.
+        return False
+    thumbnails.backend.delete(ImageFile(name, storage))
+    return True
@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает пользователей, группы, посты, комментарии '
+        'и подписки в файл NDJSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из БД за раз',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Дописать файл после последней целой записи',
+        )
+
+    def handle(self, *args, **options):
+        path, chunk_size = options['path'], options['chunk_size']
+        after = None
+        if options['resume'] and os.path.exists(path):
+            after = transfer.truncate_to_last_record(path)
+            if after:
+                self.stdout.write(f'Продолжаем после {after[0]} {after[1]}')
+        mode = 'a' if options['resume'] else 'w'
+        # Одна транзакция — один снимок базы на всю выгрузку.
+        with open(path, mode, encoding='utf-8') as output:
+            with transaction.atomic():
+                for name, rows, total in transfer.sections(after):
+                    self.export(output, name, rows, total, chunk_size)
+
+    def export(self, output, name, rows, total, chunk_size):
+        written = 0
+        for record in transfer.records(name, rows, chunk_size):
+            output.write(transfer.dumps(record) + '\n')
+            written += 1
+            if written % chunk_size == 0:
+                self.stdout.write(f'{name}: {written}/{total}')
+        self.stdout.write(f'{name}: выгружено {written}')
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки и миниатюры, на которые не ссылается ни один пост'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько файлов сверять с БД за один запрос',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=100,
+            help='Не больше стольких удалений в секунду (0 — без ограничения)',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=settings.MEDIA_BLOB_GRACE_PERIOD,
+            help='Не трогать файлы моложе стольких секунд',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.dry_run = options['dry_run']
+        self.interval = 1 / options['rate'] if options['rate'] else 0
+        self.next_at = time.monotonic()
+        batch_size, min_age = options['batch_size'], options['min_age']
+        phases = (
+            ('картинок', media.orphan_originals(batch_size, min_age),
+             media.delete_original),
+            ('записей kvstore', media.orphan_sources(batch_size),
+             media.delete_source),
+            ('миниатюр', media.orphan_thumbnails(batch_size, min_age),
+             media.delete_thumbnail),
+        )
+        for title, orphans, delete in phases:
+            count = 0
+            for image in orphans:
+                self.remove(image, delete)
+                count += 1
+            verb = 'Найдено' if self.dry_run else 'Удалено'
+            self.stdout.write(f'{verb} {title}: {count}')
+
+    def remove(self, image, delete):
+        if self.verbosity > 1:
+            self.stdout.write(image.name)
+        if self.dry_run:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(self.next_at, now) + self.interval
+        delete(image)
@@ -0,0 +1,111 @@
+import gc
+import json
+import os
+from collections import Counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core import page_cache
+from posts import caching, thumbnails, transfer
+
+
+class Command(BaseCommand):
+    help = 'Потоково загружает выгрузку export_yatube пачками bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей вставлять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить с места, сохранённого в <path>.offset',
+        )
+
+    def handle(self, *args, **options):
+        path, batch_size = options['path'], options['batch_size']
+        self.state = f'{path}.offset'
+        if not options['resume'] and not transfer.target_is_empty():
+            raise CommandError(
+                'В базе уже есть посты или комментарии: их id могут '
+                'совпасть с id из выгрузки. Загружайте в пустую базу '
+                'или продолжайте прерванную загрузку с --resume'
+            )
+        offset = 0
+        if options['resume'] and os.path.exists(self.state):
+            with open(self.state) as state:
+                offset = int(state.read())
+            self.stdout.write(f'Продолжаем с байта {offset}')
+        self.size = os.path.getsize(path) or 1
+        self.percent = None
+        loaded, skipped = Counter(), 0
+        with transfer.original_dates(), open(path, 'rb') as source:
+            source.seek(offset)
+            name, batch = None, []
+            while True:
+                position = source.tell()
+                line = source.readline()
+                record = self.parse(line, position) if line.strip() else None
+                if batch and (
+                    record is None
+                    or record['type'] != name
+                    or len(batch) >= batch_size
+                ):
+                    skipped += transfer.load(name, batch)
+                    loaded[name] += len(batch)
+                    self.checkpoint(position)
+                    batch = []
+                    # Post и его FieldFile ссылаются друг на друга: без
+                    # сборки циклов память растёт до полного прохода gc.
+                    gc.collect()
+                if not line:
+                    break
+                if record is not None:
+                    name = record['type']
+                    batch.append(record)
+        for name in transfer.SECTION_NAMES:
+            self.stdout.write(f'{name}: загружено {loaded[name]}')
+        if skipped:
+            self.stdout.write(f'Пропущено без связанных записей: {skipped}')
+        self.finalize()
+        if os.path.exists(self.state):
+            os.remove(self.state)
+
+    def parse(self, line, position):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise CommandError(f'Битая запись на байте {position}')
+        if record.get('type') not in transfer.BUILDERS:
+            raise CommandError(
+                f'Неизвестный тип записи на байте {position}: '
+                f'{record.get("type")}'
+            )
+        return record
+
+    def checkpoint(self, position):
+        temporary = f'{self.state}.tmp'
+        with open(temporary, 'w') as state:
+            state.write(str(position))
+        os.replace(temporary, self.state)
+        percent = position * 100 // self.size
+        if percent != self.percent:
+            self.percent = percent
+            self.stdout.write(f'{percent}%')
+
+    def finalize(self):
+        # bulk_create не отправляет сигналы: счётчики, ленты, миниатюры
+        # и кэши приводим в порядок после загрузки.
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_timelines', stdout=self.stdout)
+        queued = thumbnails.enqueue_missing()
+        self.stdout.write(f'В очереди миниатюр: {queued}')
+        caching.bump()
+        caching.bump('cards')
+        page_cache.purge('index')
+        page_cache.mark_changed('cards')
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import deletion
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Фоновое удаление пользователей и их данных небольшими пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Кого поставить в очередь на удаление',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и выйти',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.USER_DELETION_BATCH_SIZE,
+            help='Сколько строк удалять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.USER_DELETION_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username__in=options['usernames'])
+        missing = set(options['usernames']) - {user.username for user in users}
+        if missing:
+            raise CommandError(
+                f'Пользователи не найдены: {", ".join(sorted(missing))}'
+            )
+        for user in users:
+            deletion.schedule(user)
+            self.stdout.write(f'{user.username}: поставлен в очередь')
+        while True:
+            current, done = deletion.process(options['batch_size'])
+            if done:
+                self.stdout.write(
+                    f'{current.user.username}: {current.stage}, '
+                    f'удалено строк {current.deleted}'
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Фоновый обработчик очереди миниатюр к картинкам постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и выйти',
+        )
+        parser.add_argument(
+            '--enqueue-missing',
+            action='store_true',
+            help='Поставить в очередь посты, у которых нет миниатюр',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.THUMBNAIL_WORKER_BATCH_SIZE,
+            help='Сколько заданий брать за один проход',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.THUMBNAIL_WORKER_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_missing']:
+            queued = thumbnails.enqueue_missing()
+            self.stdout.write(f'В очередь поставлено постов: {queued}')
+        total = 0
+        while True:
+            done = thumbnails.process(options['batch_size'])
+            total += done
+            if done:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f'Обработано постов: {total}')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from posts import counters
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Исправляет расхождения денормализованных счётчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк проверять за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_users = self._run(
+            User, batch_size, counters.ensure_users, counters.reconcile_users
+        )
+        fixed_posts = self._run(Post, batch_size, counters.reconcile_posts)
+        self.stdout.write(
+            f'Исправлено пользователей: {fixed_users}, постов: {fixed_posts}'
+        )
+        # Оценки числа строк в админке читаются из sqlite_stat1.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write('Статистика планировщика обновлена')
+
+    def _run(self, model, batch_size, *steps):
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        fixed = 0
+        for first_pk in range(1, last_pk + 1, batch_size):
+            with transaction.atomic():
+                for step in steps:
+                    fixed += step(first_pk, first_pk + batch_size - 1) or 0
+        return fixed
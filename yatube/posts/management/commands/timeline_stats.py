@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики рассылки и сборки лент подписок'
+
+    def handle(self, *args, **options):
+        for name, value in timeline.metrics().items():
+            self.stdout.write(f'{name}: {value}')
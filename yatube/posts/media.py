@@ -0,0 +1,127 @@
+import os
+import time
+from itertools import islice
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import thumbnails
+from .models import Post
+
+
+def scan(directory):
+    """Обходит файлы дерева без списков каталогов в памяти: в стеке
+    только ещё не пройденные подкаталоги."""
+    stack = [directory]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _old_files(storage, directory, batch_size, min_age):
+    deadline = time.time() - min_age
+    root = storage.path('')
+    for batch in batched(scan(storage.path(directory)), batch_size):
+        yield [
+            os.path.relpath(entry.path, root).replace(os.sep, '/')
+            for entry in batch
+            if entry.stat(follow_symlinks=False).st_mtime < deadline
+        ]
+
+
+def orphan_originals(batch_size, min_age):
+    field = Post._meta.get_field('image')
+    for names in _old_files(
+        field.storage, field.upload_to, batch_size, min_age
+    ):
+        referenced = set(
+            Post.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        for name in names:
+            if name not in referenced:
+                yield ImageFile(name, field.storage)
+
+
+def orphan_sources(batch_size):
+    """Записи kvstore о картинках, на которые не ссылается ни один пост.
+
+    Ключи читаются страницами по возрастанию, а не одним курсором:
+    удаление строк по ходу не мешает обходу."""
+    prefix = add_prefix('')
+    last = prefix
+    while True:
+        rows = list(
+            KVStoreModel.objects.filter(
+                key__startswith=prefix, key__gt=last
+            ).order_by('key').values_list('key', 'value')[:batch_size]
+        )
+        if not rows:
+            return
+        last = rows[-1][0]
+        sources = [
+            image for image in map(deserialize_image_file, (
+                value for _, value in rows
+            ))
+            if not image.name.startswith(thumbnail_settings.THUMBNAIL_PREFIX)
+        ]
+        referenced = set(
+            Post.objects.filter(
+                image__in=[source.name for source in sources]
+            ).values_list('image', flat=True)
+        )
+        for source in sources:
+            if source.name not in referenced:
+                yield source
+
+
+def orphan_thumbnails(batch_size, min_age):
+    storage = default.storage
+    for names in _old_files(
+        storage, thumbnail_settings.THUMBNAIL_PREFIX, batch_size, min_age
+    ):
+        keys = {add_prefix(ImageFile(name, storage).key): name
+                for name in names}
+        known = set(
+            KVStoreModel.objects.filter(key__in=keys).values_list(
+                'key', flat=True
+            )
+        )
+        for key, name in keys.items():
+            if key not in known:
+                yield ImageFile(name, storage)
+
+
+def delete_original(image):
+    thumbnails.backend.delete(image)
+
+
+def delete_source(image):
+    # Сам файл не наш (или его уже нет): убираем только миниатюры и
+    # записи о них.
+    thumbnails.backend.delete(image, delete_file=False)
+
+
+def delete_thumbnail(image):
+    image.delete()
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnail_job', to='posts.Post')),
+            ],
+        ),
+    ]
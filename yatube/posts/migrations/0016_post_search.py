@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:10
+
+from django.db import migrations
+
+# Внешний контент: FTS5 хранит только индекс, текст читается из
+# posts_post. Триггеры держат индекс в синхроне и при bulk_create/update.
+FORWARD = (
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    " text, content='posts_post', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN"
+    " INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);"
+    " END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN"
+    " INSERT INTO posts_post_fts (posts_post_fts, rowid, text)"
+    " VALUES ('delete', old.id, old.text);"
+    " END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post"
+    " BEGIN"
+    " INSERT INTO posts_post_fts (posts_post_fts, rowid, text)"
+    " VALUES ('delete', old.id, old.text);"
+    " INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);"
+    " END",
+    "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild')",
+)
+
+BACKWARD = (
+    'DROP TRIGGER posts_post_fts_update',
+    'DROP TRIGGER posts_post_fts_delete',
+    'DROP TRIGGER posts_post_fts_insert',
+    'DROP TABLE posts_post_fts',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD, BACKWARD),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('stage', models.CharField(choices=[('comments', 'comments'), ('post_comments', 'post_comments'), ('follows', 'follows'), ('timeline', 'timeline'), ('post_timeline', 'post_timeline'), ('posts', 'posts')], default='comments', max_length=20, verbose_name='Этап')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='Удалено строк')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='deletion', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
+from core.storages import ContentAddressedStorage
 from yatube.settings import CHARACTERS
 
 User = get_user_model()
@@ -15,6 +17,25 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        """Без постов авторов, стоящих в очереди на удаление."""
+        return self.filter(author__deletion__isnull=True)
+
+    def for_feed(self):
+        return self.visible().select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'updated',
+            'image',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__slug',
+            'group__title',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -30,6 +51,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
@@ -42,12 +67,32 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         null=True,
         blank=True,
+        db_index=True,
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев',
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('pub_date',), name='post_pub_date'),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date',
+            ),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date',
+            ),
+        )
 
     def __str__(self):
         return self.text[:CHARACTERS]
@@ -73,6 +118,15 @@ class Comment(models.Model):
         verbose_name='Дата комментария'
     )
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('created',), name='comment_created'),
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created',
+            ),
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -87,7 +141,99 @@ class Follow(models.Model):
     )
 
     class Meta:
-        models.UniqueConstraint(
-            fields=('user', 'author'),
-            name='follow',
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='follow',
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_pub_date_post',
+            ),
         )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='timeline_user_post',
+            ),
+        )
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок',
+    )
+
+
+class ThumbnailJob(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_job',
+    )
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+
+class UserDeletion(models.Model):
+    """Надгробие пользователя, чьи данные удаляются в фоне пачками."""
+
+    STAGES = (
+        'comments',
+        'post_comments',
+        'follows',
+        'timeline',
+        'post_timeline',
+        'posts',
+    )
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='deletion',
+    )
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+    stage = models.CharField(
+        max_length=20,
+        choices=[(stage, stage) for stage in STAGES],
+        default=STAGES[0],
+        verbose_name='Этап',
+    )
+    deleted = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Удалено строк',
+    )
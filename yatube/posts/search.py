@@ -0,0 +1,75 @@
+import re
+
+from django.db import connections, router
+
+from .models import Post
+
+MAX_TERMS = 10
+
+MATCH_SQL = 'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+
+
+def match_expression(query):
+    """Строка запроса FTS5 из пользовательского ввода.
+
+    Каждое слово берётся в кавычки (операторы FTS5 не срабатывают) и
+    ищется по префиксу; слова объединяются через AND."""
+    words = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_matching(queryset, query):
+    """Сужает queryset постов до совпадений, одним подзапросом к FTS5."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    # pk__in=RawSQL(...) даёт IN ((SELECT ...)), а SQLite считает такой
+    # подзапрос скалярным и берёт только первую строку.
+    column = f'{Post._meta.db_table}.{Post._meta.pk.column}'
+    return queryset.extra(
+        where=[f'{column} IN ({MATCH_SQL})'], params=[expression]
+    )
+
+
+class SearchResults:
+    """Посты по релевантности (bm25) для Paginator: count и срезы идут
+    в индекс FTS5, а посты страницы догружаются по id."""
+
+    def __init__(self, query, queryset=None):
+        self.expression = match_expression(query)
+        self.queryset = Post.objects.for_feed() if queryset is None else (
+            queryset
+        )
+        self._count = None
+
+    def _execute(self, sql, params):
+        alias = router.db_for_read(Post)
+        with connections[alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._execute(
+                'SELECT COUNT(*) FROM posts_post_fts '
+                'WHERE posts_post_fts MATCH %s',
+                (self.expression,),
+            )[0][0] if self.expression else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError('SearchResults supports only plain slices')
+        start = index.start or 0
+        limit = (index.stop if index.stop is not None else self.count())
+        if not self.expression or limit <= start:
+            return []
+        ids = [row[0] for row in self._execute(
+            f'{MATCH_SQL} ORDER BY rank LIMIT %s OFFSET %s',
+            (self.expression, limit - start, start),
+        )]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
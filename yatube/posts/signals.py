@@ -0,0 +1,189 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import page_cache
+
+from . import caching, counters, images, timeline
+from .models import Comment, Follow, Group, Post, User
+
+# Поля, которые выводятся в карточке поста: только их правка
+# делает устаревшими уже отрисованные карточки.
+CARD_FIELDS = {
+    Group: ('slug',),
+    User: ('username', 'first_name', 'last_name'),
+}
+
+
+_batch = threading.local()
+
+
+def invalidate(func, *args):
+    """Сбрасывает кэш сразу и повторно после коммита транзакции.
+
+    Пока транзакция не зафиксирована, параллельный запрос читает старый
+    снимок базы и может снова положить его в кэш; второй сброс убирает
+    такие записи. Внутри batched_invalidation() сброс откладывается.
+    """
+    pending = getattr(_batch, 'pending', None)
+    if pending is not None:
+        pending.setdefault(func, {}).update(dict.fromkeys(args))
+        return
+    func(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(func, *args))
+
+
+@contextmanager
+def batched_invalidation():
+    """Копит сбросы кэша от сигналов пачки строк и выполняет каждый
+    один раз на выходе, объединяя суррогатные ключи."""
+    _batch.pending = {}
+    try:
+        yield
+    finally:
+        pending, _batch.pending = _batch.pending, None
+        for func, args in pending.items():
+            invalidate(func, *args)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        counters.increment_user(instance.author_id, 'posts_count')
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.increment_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.increment_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.increment_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        counters.increment_user(instance.author_id, 'followers_count')
+        counters.increment_user(instance.user_id, 'following_count')
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    counters.increment_user(instance.author_id, 'followers_count', -1)
+    counters.increment_user(instance.user_id, 'following_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    timeline.resume_fan_out(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_generation(sender, **kwargs):
+    invalidate(caching.bump)
+
+
+def bump_cards():
+    caching.bump('cards')
+    page_cache.mark_changed('cards')
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def remember_card_fields(sender, instance, update_fields=None, **kwargs):
+    fields = CARD_FIELDS[sender]
+    if update_fields and not set(update_fields) & set(fields):
+        instance.stored_card_fields = None
+        return
+    instance.stored_card_fields = instance.pk and sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+def bump_cards_generation(sender, instance, **kwargs):
+    stored = getattr(instance, 'stored_card_fields', None)
+    current = tuple(getattr(instance, field) for field in CARD_FIELDS[sender])
+    if stored and stored != current:
+        # Ленты кэшируют посты вместе с авторами и группами.
+        invalidate(caching.bump)
+        invalidate(bump_cards)
+
+
+@receiver(post_delete, sender=Group)
+def bump_cards_on_group_delete(sender, **kwargs):
+    invalidate(bump_cards)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    keys = ['index', f'post:{instance.pk}', f'author:{instance.author}']
+    if instance.group_id:
+        keys.append(f'group:{instance.group.slug}')
+    # Пост перенесли в другую группу: прежняя тоже изменилась.
+    stored_group = getattr(instance, 'stored_group', None)
+    if stored_group:
+        keys.append(f'group:{stored_group}')
+    invalidate(page_cache.purge, *keys)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    invalidate(page_cache.purge, f'comments:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    invalidate(page_cache.purge, f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    invalidate(
+        page_cache.purge,
+        f'author:{instance.author}',
+        f'author:{instance.user}',
+    )
+
+
+@receiver(pre_save, sender=Post)
+def remember_stored(sender, instance, **kwargs):
+    stored = instance.pk and Post.objects.filter(pk=instance.pk).values_list(
+        'image', 'group__slug'
+    ).first()
+    instance.stored_image, instance.stored_group = stored or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    stored = getattr(instance, 'stored_image', None)
+    if stored and stored != instance.image.name:
+        transaction.on_commit(partial(images.release, stored))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(partial(images.release, instance.image.name))
@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет колбэки on_commit, отложенные внутри блока.
+
+    TestCase не фиксирует транзакцию, и сброс кэшей после коммита в нём
+    не срабатывает. Аналог captureOnCommitCallbacks(execute=True)
+    из Django 3.2.
+    """
+    callbacks = connections[using].run_on_commit
+    start = len(callbacks)
+    try:
+        yield
+    finally:
+        while len(callbacks) > start:
+            _, callback = callbacks.pop(start)
+            callback()
@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.paginator import EstimatedCountPaginator, table_estimate
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        cls.old_group = Group.objects.create(
+            title='Старая группа', slug='old', description='Описание'
+        )
+        cls.new_group = Group.objects.create(
+            title='Новая группа', slug='new', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow(self):
+        """Список постов и комментариев не делает запрос на строку"""
+
+        for model in ('post', 'comment'):
+            with self.subTest(model=model):
+                url = reverse(f'admin:posts_{model}_changelist')
+                post = Post.objects.create(
+                    author=self.user, text='Пост', group=self.old_group
+                )
+                Comment.objects.create(post=post, author=self.user, text='к')
+                few = len(self.changelist_queries(url))
+                for _ in range(5):
+                    post = Post.objects.create(
+                        author=self.user, text='Пост', group=self.old_group
+                    )
+                    Comment.objects.create(
+                        post=post, author=self.user, text='к'
+                    )
+                self.assertEqual(len(self.changelist_queries(url)), few)
+
+    def test_no_full_count(self):
+        """Нефильтрованный список не считает строки таблицы целиком"""
+
+        Post.objects.create(author=self.user, text='Пост')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        queries = self.changelist_queries(
+            reverse('admin:posts_post_changelist')
+        )
+        self.assertFalse(
+            [sql for sql in queries if sql.startswith('SELECT COUNT(*)')]
+        )
+
+    def test_estimated_count_paginator(self):
+        """Оценка из ANALYZE без фильтров и ограниченный COUNT с ними"""
+
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(5)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.create(author=self.user, text='После ANALYZE')
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
+        with override_settings(ADMIN_COUNT_LIMIT=3):
+            paginator = EstimatedCountPaginator(
+                Post.objects.filter(author=self.user), 2
+            )
+            self.assertEqual(paginator.count, 3)
+
+    def test_reconcile_refreshes_estimate(self):
+        """reconcile_counters обновляет статистику для оценки"""
+
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(5)
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(table_estimate(Post.objects.all()), 5)
+
+    def test_move_to_group(self):
+        """Действие переносит выбранные посты и сбрасывает кэш страниц"""
+
+        posts = [
+            Post.objects.create(
+                author=self.user, text=f'Пост {i}', group=self.old_group
+            )
+            for i in range(3)
+        ]
+        anonymous = Client()
+        new_url = reverse('posts:group_list', args=(self.new_group.slug,))
+        self.assertEqual(len(anonymous.get(new_url).context['page_obj']), 0)
+        data = {
+            'action': 'move_to_group',
+            ACTION_CHECKBOX_NAME: [post.pk for post in posts[:2]],
+        }
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.post(url, data)
+        self.assertContains(response, 'name="group"')
+        self.assertEqual(Post.objects.filter(group=self.new_group).count(), 0)
+        data.update(apply='1', group=self.new_group.pk)
+        response = self.client.post(url, data)
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            set(Post.objects.filter(group=self.new_group)), set(posts[:2])
+        )
+        self.assertEqual(len(anonymous.get(new_url).context['page_obj']), 2)
@@ -0,0 +1,127 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.caching import TwoTierCache
+from posts.models import Post
+
+User = get_user_model()
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = TwoTierCache(
+            size=2, local_timeout=5, lock_timeout=1, stale_timeout=60
+        )
+        self.compute = mock.Mock(return_value='значение')
+
+    def test_local_hit(self):
+        """Повторное чтение отдаётся из памяти процесса"""
+
+        self.cache.get_or_set('key', self.compute, 60)
+        with mock.patch('posts.caching.cache') as shared:
+            value = self.cache.get_or_set('key', self.compute, 60)
+        self.assertEqual(value, 'значение')
+        shared.get.assert_not_called()
+        self.assertEqual(self.compute.call_count, 1)
+        self.assertEqual(self.cache.stats['local_hits'], 1)
+
+    def test_shared_hit(self):
+        """Другой процесс берёт значение из общего кэша"""
+
+        self.cache.get_or_set('key', self.compute, 60)
+        self.cache.clear_local()
+        self.cache.get_or_set('key', self.compute, 60)
+        self.assertEqual(self.compute.call_count, 1)
+        self.assertEqual(self.cache.stats['shared_hits'], 1)
+
+    def test_local_lru_is_bounded(self):
+        """Локальный уровень хранит не больше size ключей"""
+
+        for key in ('a', 'b', 'c'):
+            self.cache.get_or_set(key, self.compute, 60)
+        self.assertEqual(list(self.cache._local), ['b', 'c'])
+
+    def test_stale_served_while_locked(self):
+        """Пока значение пересчитывает другой, отдаётся устаревшее"""
+
+        self.cache.get_or_set('key', self.compute, 0)
+        self.cache.clear_local()
+        cache.add('lock:key', 1, 10)
+        value = self.cache.get_or_set('key', mock.Mock(), 60)
+        self.assertEqual(value, 'значение')
+        self.assertEqual(self.cache.stats['stale_served'], 1)
+
+    def test_single_flight_on_empty_cache(self):
+        """Без значения ждущий забирает результат владельца блокировки"""
+
+        cache.add('lock:key', 1, 10)
+        compute = mock.Mock()
+
+        def finish(seconds):
+            cache.set('key', ('готово', 0, 0))
+            cache.delete('lock:key')
+
+        with mock.patch('posts.caching.time.sleep', side_effect=finish):
+            value = self.cache.get_or_set('key', compute, 60)
+        self.assertEqual(value, 'готово')
+        compute.assert_not_called()
+
+    def test_early_recomputation(self):
+        """Близко к сроку значение пересчитывается заранее"""
+
+        # До конца срока секунда, а пересчёт занимал две.
+        cache.set('key', ('старое', time.time() + 1, 2.0))
+        with mock.patch('posts.caching.random.random', return_value=0.1):
+            value = self.cache.get_or_set('key', self.compute, 60)
+        self.assertEqual(value, 'значение')
+        self.cache.get_or_set('key', self.compute, 60)
+        self.assertEqual(self.compute.call_count, 1)
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def feed_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.force_login(self.user)
+            self.client.get(url)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+
+    def test_feed_page_read_once(self):
+        """Страница ленты читается из БД один раз"""
+
+        for name, args in (
+            ('posts:index', ()),
+            ('posts:profile', (self.user.username,)),
+        ):
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                self.assertTrue(self.feed_queries(url))
+                self.assertFalse(self.feed_queries(url))
+
+    def test_new_post_visible(self):
+        """Новый пост меняет поколение и попадает в ленту"""
+
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 2)
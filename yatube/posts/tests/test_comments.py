@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Post
+from yatube.settings import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.detail_url = reverse('posts:post_detail', args=(cls.post.pk,))
+        cls.more_url = reverse('posts:post_comments', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def add_comments(self, count):
+        start = timezone.now() - timedelta(days=1)
+        first = Comment.objects.count()
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=User.objects.create_user(
+                username=f'reader{i}'
+            ), text=f'Комментарий {i}')
+            for i in range(first, first + count)
+        )
+        for i, comment in enumerate(Comment.objects.order_by('pk')):
+            Comment.objects.filter(pk=comment.pk).update(
+                created=start + timedelta(minutes=i)
+            )
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def detail_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.detail_url)
+        return len(queries)
+
+    def test_first_page_is_bounded(self):
+        """На странице поста первые комментарии по времени и ссылка"""
+
+        self.add_comments(COMMENTS_PER_PAGE + 2)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(
+            self.texts(response),
+            [f'Комментарий {i}' for i in range(COMMENTS_PER_PAGE)],
+        )
+        self.assertContains(response, f'{self.more_url}?cursor=')
+
+    def test_load_more(self):
+        """Фрагмент «показать ещё» отдаёт следующие комментарии"""
+
+        self.add_comments(COMMENTS_PER_PAGE + 2)
+        cursor = self.client.get(self.detail_url).context['comments_cursor']
+        response = self.client.get(self.more_url, {'cursor': cursor})
+        self.assertEqual(self.texts(response), [
+            f'Комментарий {i}'
+            for i in range(COMMENTS_PER_PAGE, COMMENTS_PER_PAGE + 2)
+        ])
+        self.assertIsNone(response.context['comments_cursor'])
+        self.assertNotContains(response, 'data-load-more')
+        self.assertNotContains(response, '<html')
+
+    def test_missing_post(self):
+        """Фрагмент несуществующего поста — 404"""
+
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_queries_do_not_grow(self):
+        """Число запросов не зависит от числа комментариев"""
+
+        self.add_comments(2)
+        few = self.detail_queries()
+        self.add_comments(COMMENTS_PER_PAGE * 2)
+        self.assertEqual(self.detail_queries(), few)
+
+    def test_comments_use_index(self):
+        """Комментарии сортируются по индексу (post, created)"""
+
+        self.add_comments(COMMENTS_PER_PAGE + 2)
+        cursor = self.client.get(self.detail_url).context['comments_cursor']
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.more_url, {'cursor': cursor})
+        sql = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_comment"' in query['sql']
+        ]
+        self.assertEqual(len(sql), 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute('EXPLAIN QUERY PLAN ' + sql[0])
+            plan = '\n'.join(str(row[-1]) for row in db_cursor.fetchall())
+        self.assertIn('comment_post_created', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
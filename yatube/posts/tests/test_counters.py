@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Счётчик постов автора растёт и уменьшается"""
+
+        post = Post.objects.create(author=self.user, text='Пост')
+        Post.objects.create(author=self.user, text='Пост 2')
+        self.assertEqual(self.stats(self.user).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста обновляется"""
+
+        post = Post.objects.create(author=self.user, text='Пост')
+        self.reader_client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            data={'text': 'комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики подписчиков и подписок"""
+
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.user.username,))
+        )
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.user.username,))
+        )
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_profile_reads_counter(self):
+        """Профиль берёт число постов из счётчика, а не из COUNT"""
+
+        Post.objects.create(author=self.user, text='Пост')
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        response = self.reader_client.get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        self.assertEqual(response.context['posts_count'], 42)
+
+    def test_reconcile_counters(self):
+        """reconcile_counters исправляет расхождения"""
+
+        post = Post.objects.create(author=self.user, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.user)
+        Comment.objects.create(post=post, author=self.reader, text='к')
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        stats = self.stats(self.user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count), (1, 1)
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
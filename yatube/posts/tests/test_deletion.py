@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import deletion
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          UserDeletion, UserStats)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_BLOB_GRACE_PERIOD=0)
+class UserDeletionTests(TransactionTestCase):
+    """Фоновое удаление пользователя пачками."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username='leaving')
+        self.other = User.objects.create_user(username='other')
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'JPEG')
+        self.image_post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile('meme.jpg', buffer.getvalue()),
+        )
+        for i in range(4):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        other_post = Post.objects.create(author=self.other, text='Чужой')
+        Comment.objects.create(post=other_post, author=self.user, text='к')
+        Comment.objects.create(
+            post=self.image_post, author=self.other, text='к'
+        )
+        Follow.objects.create(user=self.other, author=self.user)
+        Follow.objects.create(user=self.user, author=self.other)
+
+    def test_schedule_tombstones_user(self):
+        """Постановка в очередь сразу закрывает вход и профиль"""
+
+        client = Client()
+        client.force_login(self.user)
+        deletion.schedule(self.user)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(self.user.has_usable_password())
+        self.assertEqual(
+            client.get(reverse('posts:post_create')).status_code, 302
+        )
+        response = Client().get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_schedule_hides_posts(self):
+        """Посты удаляемого автора сразу пропадают из лент и поиска"""
+
+        reader = Client()
+        reader.force_login(self.other)
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:follow_index'),
+            reverse('posts:post_search') + '?q=пост',
+        )
+        for url in pages:
+            self.assertContains(reader.get(url), 'Пост 0')
+        deletion.schedule(self.user)
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertNotContains(reader.get(url), 'Пост 0')
+        response = reader.get(
+            reverse('posts:post_detail', args=(self.image_post.pk,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_schedule_purges_groups_and_comments(self):
+        """Группы и комментарии удаляемого автора тоже сбрасываются"""
+
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=self.user, text='В группе', group=group)
+        other_post = Post.objects.get(author=self.other)
+        Comment.objects.create(
+            post=other_post, author=self.user, text='Прощальный комментарий'
+        )
+        reader = Client()
+        reader.force_login(self.other)
+        group_url = reverse('posts:group_list', args=(group.slug,))
+        comments_url = reverse('posts:post_comments', args=(other_post.pk,))
+        etag = reader.get(group_url)['ETag']
+        self.assertContains(Client().get(comments_url), 'Прощальный')
+        deletion.schedule(self.user)
+        response = reader.get(group_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'В группе')
+        self.assertNotContains(Client().get(comments_url), 'Прощальный')
+        self.assertEqual(Client().get(reverse(
+            'posts:post_comments', args=(self.image_post.pk,)
+        )).status_code, 404)
+
+    def test_batch_invalidates_once(self):
+        """Кэши сбрасываются один раз на пачку, а не на каждую строку"""
+
+        deletion.schedule(self.user)
+        with mock.patch('posts.caching.bump') as bump, mock.patch(
+            'core.page_cache.purge'
+        ) as purge:
+            while True:
+                bump.reset_mock()
+                purge.reset_mock()
+                if not deletion.process(batch_size=10)[1]:
+                    break
+                # Сразу и ещё раз после коммита.
+                self.assertLessEqual(bump.call_count, 2)
+                self.assertLessEqual(purge.call_count, 2)
+
+    def test_batched_deletion(self):
+        """Данные удаляются пачками, счётчики и картинки в порядке"""
+
+        path = self.image_post.image.path
+        deletion.schedule(self.user)
+        batches = 0
+        while deletion.process(batch_size=2)[1]:
+            batches += 1
+        self.assertGreater(batches, 5)
+        self.assertFalse(User.objects.filter(username='leaving').exists())
+        self.assertFalse(UserDeletion.objects.exists())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(Follow.objects.count(), 0)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author__username='leaving'
+        ).exists())
+        stats = UserStats.objects.get(user=self.other)
+        self.assertEqual(
+            (stats.followers_count, stats.following_count), (0, 0)
+        )
+        self.assertFalse(os.path.exists(path))
+
+    def test_resume_after_crash(self):
+        """Прерванное удаление продолжается с сохранённого этапа"""
+
+        queued = deletion.schedule(self.user)
+        for _ in range(4):
+            deletion.process(batch_size=1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.deleted, 4)
+        self.assertEqual(queued.stage, 'follows')
+        out = StringIO()
+        call_command('process_deletions', once=True, stdout=out)
+        self.assertIn('leaving: user', out.getvalue())
+        self.assertFalse(User.objects.filter(username='leaving').exists())
+
+    def test_command_schedules_usernames(self):
+        """Команда ставит пользователей в очередь по имени"""
+
+        call_command(
+            'process_deletions', 'leaving', once=True, batch_size=3,
+            stdout=StringIO(),
+        )
+        self.assertEqual(list(User.objects.values_list(
+            'username', flat=True
+        )), ['other'])
+
+    def test_admin_action(self):
+        """В админке пользователей удаляют только через очередь"""
+
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        url = reverse('admin:auth_user_changelist')
+        response = client.post(url, {
+            'action': 'schedule_deletion',
+            '_selected_action': [self.user.pk, admin.pk],
+        })
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            list(UserDeletion.objects.values_list('user', flat=True)),
+            [self.user.pk],
+        )
+        response = client.get(url)
+        actions = response.context['action_form'].fields['action'].choices
+        self.assertNotIn('delete_selected', dict(actions))
+        self.assertFalse(site._registry[User].has_delete_permission(None))
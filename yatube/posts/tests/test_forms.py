@@ -1,11 +1,14 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Group, Post
@@ -79,7 +82,7 @@ class PostCreatFormTests(TestCase):
         post_create = Post.objects.filter(
             text='Тестовый пост_1',
             group=self.group.pk,
-            image='posts/small.gif',
+            image__regex=r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$',
         )
         self.assertTrue(post_create.exists())
         self.assertEqual(response.status_code, 200)
@@ -90,7 +93,12 @@ class PostCreatFormTests(TestCase):
         self.assertEqual(post.author, self.post.author)
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.pk, form_data['group'])
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(
+            post.image.name,
+            'posts/{0:.2}/{0}.jpg'.format(
+                hashlib.sha256(post.image.read()).hexdigest()
+            ),
+        )
 
     def test_post_edit(self):
         """Валидная форма редактирует пост"""
@@ -111,3 +119,22 @@ class PostCreatFormTests(TestCase):
         post = Post.objects.get(pk=self.post.pk)
         self.assertEqual(post.author, self.post.author)
         self.assertEqual(post.group.pk, form_data['group'])
+
+    def test_truncated_image_rejected(self):
+        """Обрезанный JPEG даёт ошибку формы, а не исключение"""
+
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'JPEG')
+        content = buffer.getvalue()
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(self.reverse_name[0], {
+            'text': 'С битой картинкой',
+            'image': SimpleUploadedFile(
+                'broken.jpg', content[:len(content) // 2], 'image/jpeg'
+            ),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.context['form'].has_error('image', 'invalid_image')
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
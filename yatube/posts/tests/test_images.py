@@ -0,0 +1,205 @@
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from PIL import Image
+
+from posts import thumbnails
+from posts.images import process_upload
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(size=(3000, 2000), image_format='JPEG', **save_options):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format, **save_options)
+    return SimpleUploadedFile(
+        f'photo.{image_format.lower()}', buffer.getvalue()
+    )
+
+
+def memory_kb(field):
+    with open('/proc/self/status') as status:
+        return int(re.search(rf'{field}:\s+(\d+)', status.read()).group(1))
+
+
+def measure_upload(path, connection):
+    with open(path, 'rb') as source:
+        upload = SimpleUploadedFile('big.jpg', b'')
+        upload.file, upload.size = source, os.path.getsize(path)
+        baseline = memory_kb('VmRSS')
+        # Сбрасываем пик RSS, унаследованный от родителя.
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        process_upload(upload)
+    connection.send(memory_kb('VmHWM') - baseline)
+
+
+class ProcessUploadTests(SimpleTestCase):
+    """Обработка загруженной картинки поста."""
+
+    def open(self, upload):
+        return Image.open(BytesIO(upload.read()))
+
+    def test_downscaled_to_largest_variant(self):
+        """Картинка уменьшается до размера самого большого варианта"""
+
+        with self.open(process_upload(make_upload((6000, 4000)))) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (1440, 960))
+
+    def test_small_image_kept(self):
+        """Маленькая картинка не увеличивается"""
+
+        with self.open(process_upload(make_upload((50, 50), 'PNG'))) as image:
+            self.assertEqual(image.size, (50, 50))
+
+    def test_progressive_without_exif(self):
+        """Результат — прогрессивный JPEG без EXIF"""
+
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        upload = make_upload((800, 600), exif=exif.tobytes())
+        processed = process_upload(upload)
+        self.assertTrue(processed.name.endswith('.jpg'))
+        with self.open(processed) as image:
+            self.assertTrue(image.info.get('progressive'))
+            self.assertNotIn('exif', image.info)
+
+    def test_exif_orientation_applied(self):
+        """Поворот из EXIF применяется до удаления метаданных"""
+
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        upload = make_upload((800, 600), exif=exif.tobytes())
+        with self.open(process_upload(upload)) as image:
+            self.assertEqual(image.size, (600, 800))
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_byte_limit(self):
+        """Слишком большой файл отклоняется до декодирования"""
+
+        with self.assertRaises(ValidationError) as error:
+            process_upload(make_upload((800, 600)))
+        self.assertEqual(error.exception.code, 'file_too_large')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_pixel_limit(self):
+        """Картинка с лишними пикселями отклоняется до декодирования"""
+
+        with self.assertRaises(ValidationError) as error:
+            process_upload(make_upload((800, 600)))
+        self.assertEqual(error.exception.code, 'too_many_pixels')
+
+    @override_settings(POST_IMAGE_MAX_DECODED_PIXELS=1000)
+    def test_pixel_limit_without_draft(self):
+        """Для форматов без draft действует меньший лимит пикселей"""
+
+        process_upload(make_upload((800, 600)))
+        for image_format in ('PNG', 'GIF'):
+            with self.subTest(image_format=image_format):
+                with self.assertRaises(ValidationError) as error:
+                    process_upload(make_upload((800, 600), image_format))
+                self.assertEqual(error.exception.code, 'too_many_pixels')
+
+    def test_peak_memory(self):
+        """Пик памяти обработки ограничен и для JPEG, и для PNG"""
+
+        if not os.path.exists('/proc/self/clear_refs'):
+            self.skipTest('нужен /proc/self/clear_refs')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # 24-мегапиксельный JPEG не декодируется в полный размер, а PNG
+        # у лимита POST_IMAGE_MAX_DECODED_PIXELS не копируется лишний раз.
+        for size, image_format in (((6000, 4000), 'JPEG'),
+                                   ((2400, 1600), 'PNG')):
+            with self.subTest(image_format=image_format):
+                path = os.path.join(directory, f'big.{image_format}')
+                with open(path, 'wb') as big:
+                    big.write(make_upload(size, image_format).read())
+                context = multiprocessing.get_context('fork')
+                receiver, sender = context.Pipe(duplex=False)
+                worker = context.Process(
+                    target=measure_upload, args=(path, sender)
+                )
+                worker.start()
+                worker.join(60)
+                self.assertTrue(receiver.poll(), 'обработка упала')
+                peak_kb = receiver.recv()
+                # Один полный растр 6000x4000 RGB — это уже 70 МБ.
+                self.assertLess(peak_kb, 40 * 1024)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_BLOB_GRACE_PERIOD=0)
+class SharedImageTests(TransactionTestCase):
+    """Общие файлы картинок и подсчёт ссылок на них."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), color).save(buffer, 'JPEG')
+        return Post.objects.create(
+            author=self.user,
+            text='Мем',
+            image=SimpleUploadedFile('meme.jpg', buffer.getvalue()),
+        )
+
+    def test_same_upload_shares_blob_and_thumbnails(self):
+        """Одинаковые картинки хранятся и уменьшаются один раз"""
+
+        first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        thumbnails.generate(first.image)
+        self.assertTrue(thumbnails.is_ready(second.image))
+
+    def test_blob_deleted_with_last_reference(self):
+        """Файл удаляется, только когда на него не ссылается ни один пост"""
+
+        first, second = self.create_post(), self.create_post()
+        path = first.image.path
+        thumbnails.generate(first.image)
+        self.assertTrue(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'cache')))
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        cached = [
+            name for _, _, names in os.walk(
+                os.path.join(TEMP_MEDIA_ROOT, 'cache')
+            ) for name in names
+        ]
+        self.assertEqual(cached, [])
+
+    def test_replaced_image_released(self):
+        """Заменённая картинка удаляется, если больше не нужна"""
+
+        post = self.create_post()
+        path = post.image.path
+        post.image = self.create_post('blue').image
+        post.save()
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(MEDIA_BLOB_GRACE_PERIOD=60)
+    def test_recent_blob_kept(self):
+        """Только что записанный файл не удаляется сразу"""
+
+        post = self.create_post()
+        path = post.image.path
+        post.delete()
+        self.assertTrue(os.path.exists(path))
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        Post.objects.create(author=cls.user, text='Пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if 'ORDER BY' not in sql or not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append(
+                    '\n'.join(str(row[-1]) for row in cursor.fetchall())
+                )
+        return plans
+
+    def test_feeds_use_index_for_ordering(self):
+        """Ленты сортируются по индексу, без временного B-дерева"""
+
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:follow_index'),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                plans = self.feed_plans(url)
+                self.assertTrue(plans)
+                for plan in plans:
+                    self.assertNotIn('TEMP B-TREE', plan, plan)
+                    self.assertIn('INDEX', plan, plan)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка не создаёт дубликат"""
+
+        url = reverse('posts:profile_follow', args=(self.user.username,))
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader, author=self.user).count(),
+            1,
+        )
+
+    def test_cursor_page_seeks_index(self):
+        """Следующая страница ищет по индексу, а не сканирует таблицу"""
+
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(10)
+        )
+        url = reverse('posts:index')
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        for plan in self.feed_plans(f'{url}?cursor={cursor}'):
+            with self.subTest(plan=plan):
+                self.assertNotIn('SCAN posts_post', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
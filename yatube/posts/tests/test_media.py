@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(color):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GarbageCollectMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.storage = Post._meta.get_field('image').storage
+        self.post = self.create_post('red')
+        thumbnails.generate(self.post.image)
+
+    def create_post(self, color):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile(f'{color}.jpg', jpeg(color)),
+        )
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(path, name), TEMP_MEDIA_ROOT)
+            for path, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names
+        )
+
+    def gc(self, **options):
+        out = StringIO()
+        call_command('gc_media', min_age=0, rate=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_live_files_kept(self):
+        """Картинки и миниатюры живых постов не удаляются"""
+
+        before = self.files()
+        self.gc()
+        self.assertEqual(self.files(), before)
+
+    def test_deleted_post_files_removed(self):
+        """Картинка удалённого поста удаляется вместе с миниатюрами"""
+
+        live = self.files()
+        orphan = self.create_post('blue')
+        thumbnails.generate(orphan.image)
+        Post.objects.filter(pk=orphan.pk).delete()
+        self.assertGreater(len(self.files()), len(live))
+        self.gc()
+        self.assertEqual(self.files(), live)
+
+    def test_unknown_thumbnail_removed(self):
+        """Миниатюра, о которой не знает kvstore, удаляется"""
+
+        live = self.files()
+        thumbnails.default.storage.save(
+            'cache/ab/cd/lost.jpg', ContentFile(jpeg('red'))
+        )
+        self.gc()
+        self.assertEqual(self.files(), live)
+
+    def test_dry_run(self):
+        """--dry-run только показывает, что будет удалено"""
+
+        self.storage.save('posts/lost.jpg', ContentFile(jpeg('green')))
+        before = self.files()
+        out = self.gc(dry_run=True, verbosity=2)
+        self.assertEqual(self.files(), before)
+        self.assertIn('Найдено картинок: 1', out)
+
+    def test_recent_files_kept(self):
+        """Свежие файлы не трогаются"""
+
+        self.storage.save('posts/lost.jpg', ContentFile(jpeg('green')))
+        before = self.files()
+        call_command('gc_media', rate=0, stdout=StringIO())
+        self.assertEqual(self.files(), before)
+
+    def test_rate_limit(self):
+        """Удаления растягиваются во времени по --rate"""
+
+        for color in ('green', 'blue', 'white'):
+            self.storage.save(f'posts/{color}.jpg', ContentFile(jpeg(color)))
+        with mock.patch('time.sleep') as sleep:
+            call_command('gc_media', min_age=0, rate=1, stdout=StringIO())
+        self.assertEqual(sleep.call_count, 2)
@@ -0,0 +1,311 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core import page_cache
+from posts import caching
+from posts.models import Comment, Group, Post
+from posts.tests.helpers import run_on_commit
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        page_cache.counters.flush()
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдаётся из кэша"""
+
+        for url in self.pages:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                second = self.guest_client.get(url)
+                self.assertEqual(first['X-Page-Cache'], 'MISS')
+                self.assertEqual(second['X-Page-Cache'], 'HIT')
+                self.assertEqual(first.content, second.content)
+        self.assertEqual(page_cache.stats()['hit_ratio'], 0.5)
+
+    def test_unused_params_share_entry(self):
+        """Посторонние параметры запроса не создают новых копий страницы"""
+
+        self.guest_client.get('/?junk=1')
+        response = self.guest_client.get('/?junk=2&utm_source=x')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        pages, _ = cache.get(page_cache.surrogate_key('index'))
+        self.assertEqual(len(pages), 1)
+        response = self.guest_client.get('/?page=2')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованному пользователю кэш страниц не отдаётся"""
+
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_new_post_purges_feeds(self):
+        """Новый пост сбрасывает ленты, где он появится"""
+
+        for url in self.pages:
+            self.guest_client.get(url)
+        with run_on_commit():
+            Post.objects.create(
+                author=self.user,
+                text='Свежий пост',
+                group=self.group,
+            )
+        for url in self.pages[:3]:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'MISS')
+                self.assertContains(response, 'Свежий пост')
+
+    def test_purge_repeats_after_commit(self):
+        """Страница, закэшированная до коммита, сбрасывается после него"""
+
+        index = self.pages[0]
+        with run_on_commit():
+            with transaction.atomic():
+                Post.objects.create(author=self.user, text='Свежий пост')
+                generation = caching.generation()
+                self.guest_client.get(index)
+                response = self.guest_client.get(index)
+                self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertNotEqual(caching.generation(), generation)
+        response = self.guest_client.get(index)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_comment_purges_only_its_post(self):
+        """Комментарий сбрасывает только страницу своего поста"""
+
+        index, detail = self.pages[0], self.pages[3]
+        self.guest_client.get(index)
+        self.guest_client.get(detail)
+        with run_on_commit():
+            Comment.objects.create(
+                post=self.post,
+                author=self.user,
+                text='Новый комментарий',
+            )
+        self.assertEqual(self.guest_client.get(index)['X-Page-Cache'], 'HIT')
+        response = self.guest_client.get(detail)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новый комментарий')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.pages = (
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_if_none_match(self):
+        """Совпавший ETag даёт 304 без рендера страницы"""
+
+        for client in (self.guest_client, self.authorized_client):
+            for url in self.pages:
+                with self.subTest(url=url):
+                    etag = client.get(url)['ETag']
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertFalse(response.templates)
+                    self.assertFalse(response.content)
+
+    def test_if_modified_since(self):
+        """Совпавший Last-Modified даёт 304"""
+
+        for url in self.pages:
+            with self.subTest(url=url):
+                last_modified = self.authorized_client.get(
+                    url
+                )['Last-Modified']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_main_queries(self):
+        """304 для поста стоит одного запроса к БД сверх сессии"""
+
+        url = self.pages[2]
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.get(url)
+        with self.assertNumQueries(3):
+            self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_etag_depends_on_user(self):
+        """У разных пользователей разные ETag"""
+
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.guest_client.get(url)['ETag'],
+                    self.authorized_client.get(url)['ETag'],
+                )
+
+    def test_group_change_invalidates_old_group(self):
+        """Перенос поста в другую группу меняет ETag прежней группы"""
+
+        other = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='Описание'
+        )
+        group_url = self.pages[0]
+        etag = self.authorized_client.get(group_url)['ETag']
+        author_client = Client()
+        author_client.force_login(self.user)
+        author_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': self.post.text, 'group': other.pk},
+        )
+        response = self.authorized_client.get(
+            group_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, self.post.text)
+
+    def test_changes_invalidate_validators(self):
+        """Комментарий, подписка и правка группы меняют ETag"""
+
+        group_url, profile_url, detail_url = self.pages
+        changes = (
+            (detail_url, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )),
+            (profile_url, lambda: self.authorized_client.get(
+                reverse('posts:profile_follow', args=(self.user.username,))
+            )),
+            (group_url, lambda: Group.objects.filter(
+                pk=self.group.pk
+            ).first().save()),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                with run_on_commit():
+                    change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+
+class SurrogateIndexTests(SimpleTestCase):
+    """Индексы surrogate-ключей для сброса страниц."""
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, path, *surrogates):
+        request = RequestFactory().get(path)
+        request.surrogate_keys = set(surrogates)
+        return request
+
+    def test_index_outlives_longest_page(self):
+        """Короткая страница не укорачивает жизнь индекса длинной"""
+
+        detail = self.request('/posts/1/', 'post:1')
+        page_cache.store(detail, HttpResponse('detail'), 3600)
+        page_cache.store(self.request('/', 'post:1'), HttpResponse(), 600)
+        _, expires = cache.get(page_cache.surrogate_key('post:1'))
+        self.assertGreater(expires, time.time() + 3500)
+        page_cache.purge('post:1')
+        self.assertIsNone(cache.get(page_cache.page_key(detail)))
+
+    def test_concurrent_stores_keep_all_pages(self):
+        """Параллельные сохранения не теряют страницы в индексе"""
+
+        def worker(number):
+            for i in range(10):
+                page_cache.store(
+                    self.request(f'/{number}/{i}/', 'index'),
+                    HttpResponse(), 600,
+                )
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        pages, _ = cache.get(page_cache.surrogate_key('index'))
+        self.assertEqual(len(pages), 60)
+
+    @override_settings(PAGE_CACHE_LOCK_WAIT=0)
+    def test_busy_index_skips_store(self):
+        """Страница без записи в индекс не кэшируется"""
+
+        index_key = page_cache.surrogate_key('index')
+        cache.add(page_cache.LOCK_KEY.format(index_key), 1, 5)
+        request = self.request('/', 'index')
+        self.assertFalse(page_cache.store(request, HttpResponse(), 600))
+        self.assertIsNone(cache.get(page_cache.page_key(request)))
+
+    def test_page_without_index_dropped(self):
+        """Страница, чей индекс вытеснен, не отдаётся из кэша"""
+
+        request = self.request('/', 'index')
+        page_cache.store(request, HttpResponse(), 600)
+        self.assertIsNotNone(page_cache.lookup(request))
+        cache.delete(page_cache.surrogate_key('index'))
+        self.assertIsNone(page_cache.lookup(request))
+        self.assertIsNone(cache.get(page_cache.page_key(request)))
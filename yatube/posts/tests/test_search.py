@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import SearchResults, match_expression
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query):
+        return [post.text for post in SearchResults(query)[:100]]
+
+    def test_match_expression(self):
+        """Операторы FTS5 из ввода не исполняются, слова ищутся по префиксу"""
+
+        self.assertEqual(
+            match_expression('кот OR "пёс'), '"кот"* "OR"* "пёс"*'
+        )
+        self.assertEqual(match_expression(' *-" '), '')
+        self.assertEqual(self.found('NEAR("'), [])
+
+    def test_ranked_prefix_search(self):
+        """Поиск по префиксу без учёта регистра и диакритики, по рангу"""
+
+        Post.objects.create(author=self.user, text='Про собак и немного кот')
+        Post.objects.create(author=self.user, text='Котики, котики, котики')
+        Post.objects.create(author=self.user, text='Про собак')
+        Post.objects.create(author=self.user, text='Кофе в café')
+        self.assertEqual(
+            self.found('КОТ'),
+            ['Котики, котики, котики', 'Про собак и немного кот'],
+        )
+        self.assertEqual(self.found('собак кот'), ['Про собак и немного кот'])
+        self.assertEqual(self.found('CAFE'), ['Кофе в café'])
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при update, delete и bulk_create"""
+
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        Post.objects.bulk_create([Post(author=self.user, text='Пакетный')])
+        self.assertEqual(self.found('пакетный'), ['Пакетный'])
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.found('старый'), [])
+        self.assertEqual(self.found('новый'), ['Новый текст'])
+        Post.objects.filter(pk=post.pk).update(text='Третий текст')
+        self.assertEqual(self.found('третий'), ['Третий текст'])
+        post.delete()
+        self.assertEqual(self.found('текст'), [])
+
+    def test_search_view_paginates(self):
+        """Страница поиска делится на страницы и сохраняет запрос"""
+
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Поиск {i}') for i in range(12)
+        )
+        Post.objects.create(author=self.user, text='Не то')
+        url = reverse('posts:post_search')
+        response = self.client.get(url, {'q': 'поиск'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 12)
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(
+            response, '?q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA&page=2'
+        )
+        response = self.client.get(url, {'q': 'поиск', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_empty_query(self):
+        """Пустой запрос не трогает индекс и ничего не находит"""
+
+        Post.objects.create(author=self.user, text='Пост')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:post_search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через FTS5, а не LIKE"""
+
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        Post.objects.create(author=self.user, text='Найди меня')
+        Post.objects.create(author=self.user, text='Другой пост')
+        Post.objects.create(author=self.user, text='Найди и меня')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'найди'}
+            )
+        self.assertEqual(
+            {post.text for post in response.context['cl'].result_list},
+            {'Найди меня', 'Найди и меня'},
+        )
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('posts_post_fts', sql)
+        self.assertNotIn('LIKE', sql)
@@ -0,0 +1,243 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, ThumbnailJob
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            },
+        )
+        return Post.objects.get(text='Пост с картинкой')
+
+    def process(self):
+        call_command('process_thumbnails', once=True, stdout=StringIO())
+
+    def test_create_enqueues_job(self):
+        """Создание поста с картинкой ставит миниатюры в очередь"""
+
+        post = self.create_post()
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+
+    def test_render_never_generates(self):
+        """Страница показывает заглушку и не создаёт миниатюру"""
+
+        post = self.create_post()
+        with mock.patch.object(
+            thumbnails.backend, 'get_thumbnail'
+        ) as get_thumbnail:
+            response = self.authorized_client.get(
+                reverse('posts:post_detail', args=(post.pk,))
+            )
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_worker_prepares_thumbnails(self):
+        """Обработчик готовит миниатюры и сбрасывает страницы"""
+
+        post = self.create_post()
+        url = reverse('posts:profile', args=(self.user.username,))
+        self.authorized_client.get(url)
+        self.process()
+        self.assertFalse(ThumbnailJob.objects.exists())
+        self.assertTrue(thumbnails.is_ready(post.image))
+        response = self.authorized_client.get(url)
+        self.assertContains(response, '<img class="card-img')
+        self.assertNotContains(response, 'bg-light')
+
+    def test_edit_without_image_keeps_queue_empty(self):
+        """Правка текста не ставит миниатюры в очередь"""
+
+        post = self.create_post()
+        self.process()
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': 'Новый текст'},
+        )
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_reenqueued_job_survives(self):
+        """Задание, перезаписанное во время обработки, остаётся"""
+
+        post = self.create_post()
+
+        def generate(image):
+            thumbnails.enqueue(post)
+
+        with mock.patch.object(thumbnails, 'generate', side_effect=generate):
+            self.process()
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+
+    def test_failed_job_is_retried_limited_times(self):
+        """Сломанная картинка не крутится в очереди бесконечно"""
+
+        post = self.create_post()
+        with mock.patch.object(
+            thumbnails, 'generate', side_effect=OSError
+        ), self.assertLogs('posts.thumbnails', 'ERROR'):
+            for _ in range(settings.THUMBNAIL_MAX_ATTEMPTS + 1):
+                self.process()
+        job = ThumbnailJob.objects.get(post=post)
+        self.assertEqual(job.attempts, settings.THUMBNAIL_MAX_ATTEMPTS)
+
+    def test_enqueue_missing(self):
+        """--enqueue-missing находит посты без миниатюр"""
+
+        post = Post.objects.create(
+            author=self.user,
+            text='Старый пост',
+            image=SimpleUploadedFile(
+                'old.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        call_command(
+            'process_thumbnails', once=True, enqueue_missing=True,
+            stdout=StringIO(),
+        )
+        post.refresh_from_db()
+        self.assertTrue(thumbnails.is_ready(post.image))
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_FORMATS=('WEBP', 'JPEG'),
+    POST_IMAGE_WIDTHS=(480, 960),
+)
+class ResponsiveImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generates_every_width(self):
+        """Готовится каждая ширина в каждом доступном формате"""
+
+        thumbnails.generate(self.post.image)
+        ready = thumbnails.prepared_variants(self.post.image)
+        for image_format in thumbnails.available_formats():
+            with self.subTest(image_format=image_format):
+                self.assertEqual(
+                    [width for width, _ in ready[image_format]], [480, 960]
+                )
+        self.assertTrue(thumbnails.is_ready(self.post.image))
+
+    def test_unsupported_format_skipped(self):
+        """Формат, который Pillow не умеет писать, пропускается"""
+
+        with mock.patch.object(thumbnails.Image, 'SAVE', {'JPEG': None}):
+            self.assertEqual(thumbnails.available_formats(), ['JPEG'])
+
+    def test_picture_markup(self):
+        """Карточка отдаёт <picture> с srcset для WebP и JPEG"""
+
+        def resolve(images):
+            return [
+                {
+                    image_format: [
+                        (width, mock.Mock(
+                            url=f'/media/{width}.{image_format.lower()}'
+                        ))
+                        for width in (480, 960)
+                    ]
+                    for image_format in ('WEBP', 'JPEG')
+                }
+                for _ in images
+            ]
+
+        with mock.patch.object(thumbnails, 'resolve', side_effect=resolve):
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        self.assertContains(
+            response,
+            '<source type="image/webp" '
+            'srcset="/media/480.webp 480w, /media/960.webp 960w"',
+        )
+        self.assertContains(response, 'src="/media/960.jpeg"')
+        self.assertContains(
+            response, 'srcset="/media/480.jpeg 480w, /media/960.jpeg 960w"'
+        )
+
+    def test_page_resolved_in_one_lookup(self):
+        """Картинки всей страницы ищутся одним запросом к хранилищу"""
+
+        for i in range(3):
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(
+                    f'small{i}.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            )
+        for post in Post.objects.all():
+            thumbnails.generate(post.image)
+        cache.clear()
+        with mock.patch.object(
+            thumbnails, 'get_many_raw', wraps=thumbnails.get_many_raw
+        ) as get_many_raw:
+            response = self.client.get(
+                reverse('posts:profile', args=(self.user.username,))
+            )
+        get_many_raw.assert_called_once()
+        self.assertContains(response, '<picture>', count=4)
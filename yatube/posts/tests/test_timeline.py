@@ -0,0 +1,165 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает в ленты подписчиков автора"""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader)
+                 .values_list('post', flat=True)),
+            [post.pk],
+        )
+
+    def test_stats_command_reads_shared_counters(self):
+        """Счётчики лент видны через общий кэш и timeline_stats"""
+
+        timeline.counters.flush()
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Новый пост')
+        out = StringIO()
+        call_command('timeline_stats', stdout=out)
+        self.assertIn('fanouts: 1\n', out.getvalue())
+        self.assertEqual(cache.get(timeline.counters.key('fanouts')), 1)
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка дозаполняет ленту, отписка очищает её"""
+
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    @override_settings(TIMELINE_MAX_ENTRIES=3)
+    def test_timeline_is_capped(self):
+        """Лента хранит не больше TIMELINE_MAX_ENTRIES записей"""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.reader)
+                .values_list('post', flat=True)),
+            {post.pk for post in posts[2:]},
+        )
+
+    @override_settings(TIMELINE_MAX_ENTRIES=1)
+    def test_fan_out_trims_in_one_query(self):
+        """Рассылка обрезает все ленты одним DELETE"""
+
+        Post.objects.create(author=self.author, text='Старый пост')
+        for user in (self.reader, self.other):
+            Follow.objects.create(user=user, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(author=self.author, text='Новый пост')
+        deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE')
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('post', flat=True)),
+            [post.pk, post.pk],
+        )
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленту"""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        TimelineEntry.objects.all().delete()
+        call_command(
+            'rebuild_timelines', self.reader.username, stdout=StringIO()
+        )
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('post', flat=True)),
+            [post.pk],
+        )
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора не рассылаются,
+        а подмешиваются в ленту при чтении"""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        posts = [
+            Post.objects.create(author=self.other, text='Пост 1'),
+            Post.objects.create(author=self.author, text='Пост 2'),
+            Post.objects.create(author=self.other, text='Пост 3'),
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.author)
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+        stats = timeline.metrics()
+        self.assertEqual(stats['fanout_threshold'], 1)
+        self.assertGreater(stats['merges'], 0)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_unfollow_below_threshold_backfills(self):
+        """Автор, опустившийся до порога, дозаполняет ленты подписчиков"""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        Follow.objects.filter(user=self.other).delete()
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader)
+                 .values_list('post', flat=True)),
+            [post.pk],
+        )
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_reconcile_below_threshold_backfills(self):
+        """Сверка счётчиков ниже порога тоже дозаполняет ленты"""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.author).update(followers_count=5)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader)
+                 .values_list('post', flat=True)),
+            [post.pk],
+        )
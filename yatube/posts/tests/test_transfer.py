@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+from posts.search import SearchResults
+
+User = get_user_model()
+MEMORY_CEILING = 1024 * 1024
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'yatube.ndjson')
+        self.author = User.objects.create_user(
+            username='author', password='secret', first_name='Лев'
+        )
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {i}', group=self.group
+            )
+            for i in range(5)
+        ]
+        self.old_date = timezone.now() - timedelta(days=365)
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            pub_date=self.old_date
+        )
+        Comment.objects.create(
+            post=self.posts[1], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def export(self, **options):
+        call_command('export_yatube', self.path, stdout=StringIO(), **options)
+        with open(self.path, encoding='utf-8') as exported:
+            return exported.read()
+
+    def import_(self, **options):
+        call_command('import_yatube', self.path, stdout=StringIO(), **options)
+
+    def wipe(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка сохраняют данные, даты и связи"""
+
+        lines = self.export(chunk_size=2).splitlines()
+        self.assertEqual(
+            [json.loads(line)['type'] for line in lines],
+            ['user'] * 2 + ['group'] + ['post'] * 5 + ['comment', 'follow'],
+        )
+        self.wipe()
+        self.import_(batch_size=2)
+        author = User.objects.get(username='author')
+        self.assertTrue(author.check_password('secret'))
+        self.assertEqual(author.first_name, 'Лев')
+        self.assertEqual(
+            sorted(Post.objects.values_list('pk', flat=True)),
+            sorted(post.pk for post in self.posts),
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).pub_date, self.old_date
+        )
+        self.assertEqual(Post.objects.filter(group__slug='group').count(), 5)
+        comment = Comment.objects.get()
+        self.assertEqual(
+            (comment.post_id, comment.author.username),
+            (self.posts[1].pk, 'reader'),
+        )
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author=author
+        ).exists())
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 5)
+        self.assertEqual(len(SearchResults('пост')), 5)
+
+    def test_import_into_non_empty_target(self):
+        """Загрузка в базу с постами отклоняется: их id могут совпасть"""
+
+        self.export()
+        Post.objects.exclude(pk=self.posts[0].pk).delete()
+        with self.assertRaisesMessage(CommandError, 'уже есть посты'):
+            self.import_()
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_import_is_idempotent(self):
+        """Повторная загрузка с --resume не создаёт дубликатов"""
+
+        self.export()
+        self.wipe()
+        self.import_()
+        self.import_(resume=True)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 2)
+
+    def measure(self, command, **options):
+        tracemalloc.start()
+        try:
+            call_command(command, self.path, stdout=StringIO(), **options)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @override_settings(TIMELINE_MAX_ENTRIES=50)
+    def test_memory_does_not_grow_with_rows(self):
+        """Пик памяти выгрузки и загрузки не зависит от числа постов"""
+
+        peaks = []
+        for total in (250, 1000):
+            Post.objects.bulk_create(
+                Post(author=self.author, text='Текст поста ' * 20)
+                for _ in range(total - Post.objects.count())
+            )
+            export = self.measure('export_yatube', chunk_size=100)
+            Post.objects.all().delete()
+            load = self.measure('import_yatube', batch_size=100)
+            self.assertEqual(Post.objects.count(), total)
+            peaks.append((export, load))
+        for small, large in zip(*peaks):
+            self.assertLess(large, small * 1.5)
+            self.assertLess(large, MEMORY_CEILING)
+
+    def test_export_resume(self):
+        """--resume отрезает недописанную строку и продолжает выгрузку"""
+
+        full = self.export()
+        lines = full.splitlines(keepends=True)
+        with open(self.path, 'w', encoding='utf-8') as partial:
+            partial.write(''.join(lines[:4]) + lines[4][:10])
+        self.assertEqual(self.export(resume=True), full)
+
+    def test_import_resume(self):
+        """После сбоя загрузка продолжается с сохранённого места"""
+
+        lines = self.export().splitlines(keepends=True)
+        broken = lines[:]
+        broken[6] = '{"type": "post", \n'
+        with open(self.path, 'w', encoding='utf-8') as source:
+            source.write(''.join(broken))
+        self.wipe()
+        with self.assertRaisesMessage(CommandError, 'Битая запись'):
+            self.import_(batch_size=1)
+        self.assertEqual(Post.objects.count(), 2)
+        with open(self.path, 'w', encoding='utf-8') as source:
+            source.write(''.join(lines))
+        self.import_(batch_size=1, resume=True)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertFalse(os.path.exists(f'{self.path}.offset'))
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.utils import (CURSOR_NEXT, CursorPaginator, decode_cursor,
+                         encode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Тестовый пост_{i}')
+            for i in range(25)
+        )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_roundtrip(self):
+        """Курсор кодируется и декодируется без потерь"""
+
+        post = self.posts[0]
+        direction, pub_date, pk = decode_cursor(
+            encode_cursor(CURSOR_NEXT, post)
+        )
+        self.assertEqual(
+            (direction, pub_date, pk),
+            (CURSOR_NEXT, post.pub_date, post.pk),
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу"""
+
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.cursor_page('not-a-cursor')
+        self.assertEqual(list(page), self.posts[:10])
+
+    def test_walk_forward_and_back(self):
+        """Переход по курсорам вперёд и назад возвращает те же страницы"""
+
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.cursor_page()
+        second = paginator.cursor_page(first.next_cursor)
+        third = paginator.cursor_page(second.next_cursor)
+        self.assertEqual(list(second), self.posts[10:20])
+        self.assertEqual(list(third), self.posts[20:])
+        self.assertIsNone(third.next_cursor)
+        self.assertIsNone(first.previous_cursor)
+        back = paginator.cursor_page(third.previous_cursor)
+        self.assertEqual(list(back), self.posts[10:20])
+
+    def test_no_count_query(self):
+        """Страница по курсору строится без COUNT"""
+
+        page = self.guest_client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(
+                reverse('posts:index') + f'?cursor={page.next_cursor}'
+            )
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_page_parameter_fallback(self):
+        """Старые ссылки ?page= продолжают работать"""
+
+        response = self.guest_client.get(reverse('posts:index') + '?page=3')
+        self.assertEqual(list(response.context['page_obj']), self.posts[20:])
@@ -1,14 +1,19 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template.loader import render_to_string
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from posts import caching
 from posts.models import Comment, Group, Post, Follow
 
 User = get_user_model()
@@ -97,6 +102,7 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -325,11 +331,142 @@ class PostPagesTests(TestCase):
     def test_cache_index_page(self):
         """Проверка работы кэша на главной странице"""
 
+        cache.clear()
         url, _, _ = self.index_page
         response_1 = self.guest_client.get(reverse(url))
-        Post.objects.create(author=self.user, text='text_1')
+        Post.objects.filter(pk=self.post.pk).update(text='без сигналов')
         response_2 = self.guest_client.get(reverse(url))
         self.assertEqual(response_1.content, response_2.content)
+        Post.objects.create(author=self.user, text='text_1')
+        response_3 = self.guest_client.get(reverse(url))
+        self.assertNotEqual(response_1.content, response_3.content)
+        self.assertContains(response_3, 'text_1')
+
+    def test_cache_index_page_key(self):
+        """Кэш главной страницы различает страницы и авторизацию"""
+
         cache.clear()
-        response_2 = self.guest_client.get(reverse(url))
-        self.assertNotEqual(response_1.content, response_2.content)
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(12)
+        )
+        url, _, _ = self.index_page
+        first = self.guest_client.get(reverse(url))
+        second = self.guest_client.get(reverse(url) + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        authorized = self.authorized_client.get(reverse(url))
+        self.assertContains(authorized, reverse('posts:follow_index'))
+        self.assertNotContains(first, reverse('posts:follow_index'))
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def create_posts(self, number):
+        for i in range(number):
+            Post.objects.create(
+                author=self.user,
+                text=f'Тестовый пост {i}',
+                group=self.group,
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_posts(self):
+        """Число запросов к БД не зависит от числа постов на странице"""
+
+        self.create_posts(1)
+        single = {url: self.count_queries(url) for url in self.pages}
+        self.create_posts(settings.NUMBER_OF_POSTS)
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_card_is_rendered_once(self):
+        """Карточка поста рендерится один раз для всех лент"""
+
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+        with mock.patch(
+            'posts.caching.render_to_string', wraps=render_to_string
+        ) as render:
+            for url in pages:
+                self.assertContains(
+                    self.authorized_client.get(url), self.post.text
+                )
+        self.assertEqual(render.call_count, 1)
+
+    def test_edited_post_card_is_rerendered(self):
+        """После редактирования поста карточка обновляется"""
+
+        url = reverse('posts:profile', args=(self.user.username,))
+        self.authorized_client.get(url)
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        self.assertContains(
+            self.authorized_client.get(url), 'Исправленный текст'
+        )
+
+    def test_author_rename_rerenders_cards(self):
+        """Карточки перерисовываются только при смене имени автора"""
+
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        generation = caching.generation('cards')
+        self.user.email = 'auth@yatube.ru'
+        self.user.save()
+        self.user.save(update_fields=('last_login',))
+        self.assertEqual(caching.generation('cards'), generation)
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertNotEqual(caching.generation('cards'), generation)
+        self.assertContains(self.authorized_client.get(url), 'Лев')
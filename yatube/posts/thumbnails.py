@@ -0,0 +1,216 @@
+import logging
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedThumbnailBackend(ThumbnailBackend):
+    """Считает имя файла миниатюры так же, как sorl, но не создаёт её."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = PreparedThumbnailBackend()
+
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+
+def available_formats():
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def variants():
+    crop_width, crop_height = settings.POST_IMAGE_CROP
+    for image_format in available_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * crop_height / crop_width)
+            options = {'crop': 'center', 'upscale': True,
+                       'format': image_format}
+            yield width, image_format, f'{width}x{height}', options
+
+
+def get_many_raw(keys):
+    """Значения из key-value store sorl за один get_many к кэшу и один
+    запрос к БД на промахи."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        # Отсутствие тоже кэшируется, как это делает сам sorl.
+        fetched = {
+            key: rows.get(key, cached_db_kvstore.EMPTY_VALUE)
+            for key in missing
+        }
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        found.update(fetched)
+    return {
+        key: value for key, value in found.items()
+        if value != cached_db_kvstore.EMPTY_VALUE
+    }
+
+
+def _variant_keys(image):
+    if not image:
+        return {}
+    return {
+        add_prefix(backend.thumbnail_file(image, geometry, **options).key): (
+            width, image_format
+        )
+        for width, image_format, geometry, options in variants()
+    }
+
+
+def resolve(images):
+    keyed = [_variant_keys(image) for image in images]
+    values = get_many_raw([key for keys in keyed for key in keys])
+    resolved = []
+    for keys in keyed:
+        ready = {}
+        for key, (width, image_format) in keys.items():
+            if key in values:
+                ready.setdefault(image_format, []).append(
+                    (width, deserialize_image_file(values[key]))
+                )
+        resolved.append(ready)
+    return resolved
+
+
+def prepared_variants(image):
+    return resolve([image])[0]
+
+
+def _srcset(thumbnails):
+    return ', '.join(
+        f'{thumbnail.url} {width}w' for width, thumbnail in thumbnails
+    )
+
+
+def _picture(ready):
+    fallback = ready.pop(settings.POST_IMAGE_FORMATS[-1], None)
+    if not fallback:
+        return None
+    default_url = dict(fallback).get(
+        settings.POST_IMAGE_DEFAULT_WIDTH, fallback[-1][1]
+    ).url
+    crop_width, crop_height = settings.POST_IMAGE_CROP
+    return {
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': _srcset(thumbnails)}
+            for image_format, thumbnails in ready.items()
+        ],
+        'src': default_url,
+        'srcset': _srcset(fallback),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'width': crop_width,
+        'height': crop_height,
+    }
+
+
+def attach_pictures(posts):
+    """Проставляет post.picture всей странице постов сразу: готовые
+    варианты картинки для <picture> или None, пока их нет."""
+    posts = [post for post in posts if not hasattr(post, 'picture')]
+    for post, ready in zip(posts, resolve([post.image for post in posts])):
+        post.picture = _picture(ready)
+    return posts
+
+
+def picture(post):
+    if not hasattr(post, 'picture'):
+        attach_pictures([post])
+    return post.picture
+
+
+def is_ready(image):
+    return sum(map(len, prepared_variants(image).values())) == len(
+        list(variants())
+    )
+
+
+def enqueue(post):
+    if post.image:
+        ThumbnailJob.objects.update_or_create(
+            post=post, defaults={'created': timezone.now(), 'attempts': 0}
+        )
+
+
+def enqueue_missing():
+    queued = 0
+    posts = Post.objects.exclude(image='').only('image').order_by('pk')
+    for post in posts.iterator():
+        if not is_ready(post.image):
+            enqueue(post)
+            queued += 1
+    return queued
+
+
+def generate(image):
+    for _, _, geometry, options in variants():
+        backend.get_thumbnail(image, geometry, **options)
+
+
+def process(limit):
+    jobs = ThumbnailJob.objects.select_related('post').filter(
+        attempts__lt=settings.THUMBNAIL_MAX_ATTEMPTS
+    ).order_by('created')[:limit]
+    done = 0
+    for job in jobs:
+        try:
+            generate(job.post.image)
+        except Exception:
+            logger.exception('thumbnails for post %s failed', job.post_id)
+            ThumbnailJob.objects.filter(pk=job.pk).update(
+                attempts=F('attempts') + 1
+            )
+            continue
+        # Если пост успели снова отредактировать, задание перезаписано
+        # и должно остаться в очереди; если удалить — его уже нет.
+        deleted, _ = ThumbnailJob.objects.filter(
+            pk=job.pk, created=job.created
+        ).delete()
+        if deleted:
+            # Сохранение меняет ключ карточки и сбрасывает страницы с
+            # заглушкой вместо миниатюры.
+            job.post.save(update_fields=('updated',))
+            done += 1
+    return done
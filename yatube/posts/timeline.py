@@ -0,0 +1,206 @@
+import heapq
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from core.metrics import SharedCounters
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import CursorPaginator, keyset_slice
+
+logger = logging.getLogger(__name__)
+
+counters = SharedCounters('timeline')
+COUNTERS = (
+    'fanouts', 'fanouts_skipped', 'threshold_backfills',
+    'merges', 'merge_sources', 'merge_rows', 'merge_ms',
+)
+
+TRIM_SQL = (
+    'DELETE FROM {0} WHERE id IN ('
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY user_id ORDER BY pub_date DESC, id DESC'
+    ') AS position FROM {0} WHERE user_id IN ({1})'
+    ') WHERE position > %s)'
+)
+
+
+def metrics():
+    return {
+        'fanout_threshold': settings.TIMELINE_FANOUT_THRESHOLD,
+        **counters.read(*COUNTERS),
+    }
+
+
+def is_pulled(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).exists()
+
+
+def pulled_authors(user_id):
+    return list(UserStats.objects.filter(
+        user__following__user_id=user_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).values_list('user_id', flat=True))
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim(*user_ids):
+    """Обрезает ленты пользователей до TIMELINE_MAX_ENTRIES одним
+    DELETE: лишние записи нумеруются оконной функцией по каждой ленте."""
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    alias = router.db_for_write(TimelineEntry)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            TRIM_SQL.format(TimelineEntry._meta.db_table, placeholders),
+            (*user_ids, settings.TIMELINE_MAX_ENTRIES),
+        )
+
+
+def fan_out(post):
+    if is_pulled(post.author_id):
+        counters.incr('fanouts_skipped')
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        )
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _write_batch(batch)
+            batch = []
+    if batch:
+        _write_batch(batch)
+    counters.incr('fanouts')
+
+
+def _write_batch(entries):
+    with transaction.atomic():
+        _insert(entries)
+        trim(*{entry.user_id for entry in entries})
+
+
+def backfill(user_id, author_id):
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_ENTRIES]
+    with transaction.atomic():
+        _insert([
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ])
+        trim(user_id)
+
+
+def backfill_followers(author_id):
+    """Автор снова рассылает посты: пока его посты подмешивались при
+    чтении, в inbox подписчиков они не попадали."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+    counters.incr('threshold_backfills')
+
+
+def resume_fan_out(author_id):
+    """После отписки проверяет, не опустился ли автор до порога
+    TIMELINE_FANOUT_THRESHOLD, и если да — дозаполняет ленты."""
+    dropped = UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).exists()
+    if dropped:
+        backfill_followers(author_id)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def rebuild(user_id):
+    authors = Follow.objects.filter(user_id=user_id).exclude(
+        author_id__in=pulled_authors(user_id)
+    ).values_list('author_id', flat=True)
+    posts = Post.objects.filter(author_id__in=authors).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_ENTRIES]
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        _insert([
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ])
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: inbox из TimelineEntry плюс посты авторов,
+    у которых больше TIMELINE_FANOUT_THRESHOLD подписчиков, подмешанные
+    при чтении k-way слиянием."""
+
+    def __init__(self, object_list, per_page, user):
+        super().__init__(object_list, per_page)
+        self.user = user
+
+    def fetch(self, bound, descending):
+        started = time.monotonic()
+        limit = self.per_page + 1
+        inbox = [
+            entry.post for entry in keyset_slice(
+                TimelineEntry.objects.filter(
+                    user=self.user, post__author__deletion__isnull=True,
+                ).select_related('post__author', 'post__group'),
+                bound, limit, descending, pk_field='post_id',
+            )
+        ]
+        authors = pulled_authors(self.user.pk)
+        sources = [inbox] + [
+            keyset_slice(
+                Post.objects.for_feed().filter(author_id=author_id),
+                bound, limit, descending,
+            )
+            for author_id in authors
+        ]
+        merged = heapq.merge(
+            *sources,
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=descending,
+        )
+        rows, seen = [], set()
+        for post in merged:
+            if post.pk in seen:
+                continue
+            seen.add(post.pk)
+            rows.append(post)
+            if len(rows) == limit:
+                break
+        elapsed = time.monotonic() - started
+        counters.incr('merges')
+        counters.incr('merge_sources', len(sources))
+        counters.incr('merge_rows', sum(len(source) for source in sources))
+        counters.incr('merge_ms', round(elapsed * 1000))
+        logger.debug(
+            'timeline merge: user=%s pulled_authors=%s rows=%s %.1fms',
+            self.user.pk, len(authors), len(rows), elapsed * 1000,
+        )
+        return rows
@@ -0,0 +1,216 @@
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Порядок секций — порядок зависимостей при загрузке. Пользователи,
+# группы и подписки ссылаются друг на друга по username/slug, поэтому
+# их id в целевой базе могут быть другими. id постов и комментариев
+# сохраняются: по ним повторная загрузка пропускает уже вставленное.
+# Поэтому загружать можно только в базу без постов и комментариев,
+# иначе пост из выгрузки совпадёт по id с чужим и молча потеряется.
+SECTIONS = (
+    ('user', User, {
+        'id': 'id', 'username': 'username', 'password': 'password',
+        'first_name': 'first_name', 'last_name': 'last_name',
+        'email': 'email', 'is_active': 'is_active', 'is_staff': 'is_staff',
+        'is_superuser': 'is_superuser', 'date_joined': 'date_joined',
+        'last_login': 'last_login',
+    }),
+    ('group', Group, {
+        'id': 'id', 'slug': 'slug', 'title': 'title',
+        'description': 'description',
+    }),
+    ('post', Post, {
+        'id': 'id', 'author__username': 'author', 'group__slug': 'group',
+        'text': 'text', 'pub_date': 'pub_date', 'updated': 'updated',
+        'image': 'image',
+    }),
+    ('comment', Comment, {
+        'id': 'id', 'post_id': 'post', 'author__username': 'author',
+        'text': 'text', 'created': 'created',
+    }),
+    ('follow', Follow, {
+        'id': 'id', 'user__username': 'user', 'author__username': 'author',
+    }),
+)
+SECTION_NAMES = [name for name, _, _ in SECTIONS]
+
+
+def _encode(value):
+    # Не DjangoJSONEncoder: он обрезает время до миллисекунд.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(record):
+    return json.dumps(record, default=_encode, ensure_ascii=False)
+
+
+def sections(after=None):
+    """(name, queryset, count) секций выгрузки, начиная после записи
+    after = (name, id), если выгрузка продолжается."""
+    start = SECTION_NAMES.index(after[0]) if after else 0
+    for name, model, columns in SECTIONS[start:]:
+        queryset = model.objects.order_by('pk')
+        if after and name == after[0]:
+            queryset = queryset.filter(pk__gt=after[1])
+        yield name, queryset.values_list(*columns), queryset.count()
+
+
+def records(name, rows, chunk_size):
+    keys = list(SECTIONS[SECTION_NAMES.index(name)][2].values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield {'type': name, **dict(zip(keys, row))}
+
+
+def truncate_to_last_record(path):
+    """Обрезает недописанную строку в конце файла и возвращает
+    (type, id) последней целой записи или None для пустого файла."""
+    with open(path, 'rb+') as output:
+        end = output.seek(0, os.SEEK_END)
+        position, tail = end, b''
+        while position > 0:
+            step = min(64 * 1024, position)
+            position -= step
+            output.seek(position)
+            tail = output.read(step) + tail
+            lines = tail.split(b'\n')
+            if len(lines) > 2 or (position == 0 and len(lines) > 1):
+                break
+        lines = tail.split(b'\n')
+        if len(lines) < 2:
+            output.truncate(0)
+            return None
+        output.truncate(end - len(lines[-1]))
+        last = json.loads(lines[-2])
+        return last['type'], last['id']
+
+
+@contextmanager
+def original_dates():
+    """Отключает auto_now/auto_now_add, чтобы bulk_create сохранил даты
+    из выгрузки, а не текущее время."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def target_is_empty():
+    return not (Post.objects.exists() or Comment.objects.exists())
+
+
+def _ids(model, field, values):
+    values = {value for value in values if value is not None}
+    return dict(
+        model.objects.filter(**{f'{field}__in': values}).values_list(
+            field, 'pk'
+        )
+    )
+
+
+def _build_users(batch):
+    return [
+        User(**{key: value for key, value in record.items()
+                if key not in ('type', 'id')})
+        for record in batch
+    ], 0
+
+
+def _build_groups(batch):
+    return [
+        Group(slug=record['slug'], title=record['title'],
+              description=record['description'])
+        for record in batch
+    ], 0
+
+
+def _build_posts(batch):
+    users = _ids(User, 'username', (record['author'] for record in batch))
+    groups = _ids(Group, 'slug', (record['group'] for record in batch))
+    objects = [
+        Post(
+            pk=record['id'],
+            author_id=users[record['author']],
+            group_id=groups.get(record['group']),
+            text=record['text'],
+            pub_date=record['pub_date'],
+            updated=record['updated'],
+            image=record['image'],
+        )
+        for record in batch if record['author'] in users
+    ]
+    return objects, len(batch) - len(objects)
+
+
+def _build_comments(batch):
+    users = _ids(User, 'username', (record['author'] for record in batch))
+    posts = set(Post.objects.filter(
+        pk__in=[record['post'] for record in batch]
+    ).values_list('pk', flat=True))
+    objects = [
+        Comment(
+            pk=record['id'],
+            post_id=record['post'],
+            author_id=users[record['author']],
+            text=record['text'],
+            created=record['created'],
+        )
+        for record in batch
+        if record['author'] in users and record['post'] in posts
+    ]
+    return objects, len(batch) - len(objects)
+
+
+def _build_follows(batch):
+    users = _ids(User, 'username', (
+        username for record in batch
+        for username in (record['user'], record['author'])
+    ))
+    objects = [
+        Follow(user_id=users[record['user']],
+               author_id=users[record['author']])
+        for record in batch
+        if record['user'] in users and record['author'] in users
+    ]
+    return objects, len(batch) - len(objects)
+
+
+BUILDERS = {
+    'user': _build_users,
+    'group': _build_groups,
+    'post': _build_posts,
+    'comment': _build_comments,
+    'follow': _build_follows,
+}
+
+
+def load(name, batch):
+    """Вставляет пачку записей одного типа одной транзакцией.
+
+    Строки с уже существующим ключом пропускаются (ignore_conflicts),
+    поэтому повтор пачки после сбоя безопасен. Возвращает число
+    записей, пропущенных из-за отсутствующих связей."""
+    model = SECTIONS[SECTION_NAMES.index(name)][1]
+    with transaction.atomic():
+        objects, skipped = BUILDERS[name](batch)
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+    return skipped
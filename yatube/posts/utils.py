@@ -1,7 +1,125 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
-def paginator_method(request, posts, number_per_page):
-    paginator = Paginator(posts, number_per_page)
+from .caching import feed_cache
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj, date_field='pub_date'):
+    raw = f'{direction}|{getattr(obj, date_field).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, pk) или None для битого курсора."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def keyset_slice(queryset, bound, limit, descending=True,
+                 date_field='pub_date', pk_field='pk'):
+    if bound is not None:
+        pub_date, pk = bound
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}e': pub_date}),
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{f'{pk_field}__{lookup}': pk}),
+        )
+    prefix = '-' if descending else ''
+    return list(queryset.order_by(
+        prefix + date_field, prefix + pk_field
+    )[:limit])
+
+
+def load_more(queryset, token, limit, date_field='pub_date'):
+    """Страница «показать ещё» по возрастанию (date_field, id): строки
+    после курсора и курсор следующей страницы (None, если её нет)."""
+    cursor = decode_cursor(token)
+    bound = cursor[1:] if cursor and cursor[0] == CURSOR_NEXT else None
+    rows = keyset_slice(
+        queryset, bound, limit + 1, descending=False, date_field=date_field
+    )
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(
+        CURSOR_NEXT, rows[limit - 1], date_field
+    )
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) без COUNT и OFFSET."""
+
+    is_cursor = True
+
+    def fetch(self, bound, descending):
+        return keyset_slice(
+            self.object_list, bound, self.per_page + 1, descending
+        )
+
+    def cursor_page(self, token=None):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            rows = self.fetch(None, descending=True)
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        elif cursor[0] == CURSOR_NEXT:
+            rows = self.fetch(cursor[1:], descending=True)
+            has_next, has_previous = len(rows) > self.per_page, True
+            rows = rows[:self.per_page]
+        else:
+            rows = self.fetch(cursor[1:], descending=False)
+            has_next, has_previous = True, len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            if not rows:
+                return self.cursor_page()
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(CURSOR_NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = encode_cursor(CURSOR_PREVIOUS, rows[0])
+        return self.restore_page(rows, next_cursor, previous_cursor)
+
+    def restore_page(self, rows, next_cursor, previous_cursor):
+        page = Page(rows, 1, self)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+
+def paginator_method(request, posts, number_per_page,
+                     cursor_paginator=CursorPaginator, cache_key=None):
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None and 'cursor' not in request.GET:
+        paginator = Paginator(posts, number_per_page)
+        return paginator.get_page(page_number)
+    paginator = cursor_paginator(posts, number_per_page)
+    token = request.GET.get('cursor')
+    if cache_key is None:
+        return paginator.cursor_page(token)
+
+    def snapshot():
+        page = paginator.cursor_page(token)
+        return page.object_list, page.next_cursor, page.previous_cursor
+
+    return paginator.restore_page(*feed_cache.get_or_set(
+        f'{cache_key}:{token}', snapshot, settings.FEED_CACHE_TIMEOUT
+    ))
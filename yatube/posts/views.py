@@ -1,31 +1,96 @@
+from functools import partial
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
-from yatube.settings import NUMBER_OF_POSTS
+from core.db_router import cache_timeout, replica_reads
+from core.page_cache import (add_surrogate_keys, anonymous_cache,
+                             conditional)
+from yatube.settings import (COMMENTS_PER_PAGE, INDEX_CACHE_TIMEOUT,
+                             NUMBER_OF_POSTS, POST_PAGE_CACHE_TIMEOUT)
 
+from . import caching, search, thumbnails
+from .counters import stats_for
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
-from .utils import paginator_method
+from .models import Comment, Follow, Group, Post
+from .timeline import TimelinePaginator
+from .utils import load_more, paginator_method
 
 User = get_user_model()
 
 
+def tag_posts(request, page_obj, *keys):
+    add_surrogate_keys(
+        request, *keys, *(f'post:{post.pk}' for post in page_obj)
+    )
+
+
+def comment_page(post_id, token=None):
+    comments = Comment.objects.filter(
+        post_id=post_id, author__deletion__isnull=True,
+    ).select_related('author').only('text', 'created', 'author__username')
+    return load_more(comments, token, COMMENTS_PER_PAGE, 'created')
+
+
+def group_surrogates(request, slug):
+    return (f'group:{slug}', 'cards')
+
+
+def profile_surrogates(request, username):
+    return (f'author:{username}', 'cards')
+
+
+def post_surrogates(request, post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is None:
+        return None
+    username, slug = row
+    surrogates = [
+        f'post:{post_id}', f'comments:{post_id}', f'author:{username}',
+        'cards',
+    ]
+    if slug:
+        surrogates.append(f'group:{slug}')
+    return surrogates
+
+
+@replica_reads
+@anonymous_cache()
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = paginator_method(request, post_list, NUMBER_OF_POSTS)
+    post_list = Post.objects.for_feed()
+    generation = caching.generation()
+    page_obj = paginator_method(
+        request, post_list, NUMBER_OF_POSTS,
+        cache_key=f'feed:index:{generation}',
+    )
+    tag_posts(request, page_obj, 'index')
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
+        'cache_timeout': cache_timeout(INDEX_CACHE_TIMEOUT),
+        'cache_generation': generation,
     }
     return render(request, template, context)
 
 
+@replica_reads
+@anonymous_cache()
+@conditional(group_surrogates)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     template = 'posts/group_list.html'
-    posts = group.posts.all()
-    page_obj = paginator_method(request, posts, NUMBER_OF_POSTS)
+    posts = Post.objects.for_feed().filter(group=group)
+    page_obj = paginator_method(
+        request, posts, NUMBER_OF_POSTS,
+        cache_key=f'feed:group:{group.pk}:{caching.generation()}',
+    )
+    tag_posts(request, page_obj, f'group:{slug}')
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -33,11 +98,22 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@replica_reads
+@anonymous_cache()
+@conditional(profile_surrogates)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = paginator_method(request, posts, NUMBER_OF_POSTS)
-    posts_count = posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+        deletion__isnull=True,
+    )
+    posts = Post.objects.for_feed().filter(author=author)
+    page_obj = paginator_method(
+        request, posts, NUMBER_OF_POSTS,
+        cache_key=f'feed:author:{author.pk}:{caching.generation()}',
+    )
+    tag_posts(request, page_obj, f'author:{author.username}')
+    stats = stats_for(author)
     follower = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
@@ -46,35 +122,79 @@ def profile(request, username):
     context = {
         'author': author,
         'page_obj': page_obj,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@replica_reads
+@anonymous_cache(POST_PAGE_CACHE_TIMEOUT)
+@conditional(post_surrogates)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.visible().select_related('author__stats', 'group'),
+        pk=post_id,
+    )
     author = post.author
     form_comment = CommentForm(request.POST or None)
-    comments = post.comments.all()
-    post_count = author.posts.all().count()
+    comments, comments_cursor = comment_page(post.pk)
+    post_count = stats_for(author).posts_count
+    add_surrogate_keys(
+        request, f'post:{post.pk}', f'comments:{post.pk}', f'author:{author}'
+    )
+    if post.group:
+        add_surrogate_keys(request, f'group:{post.group.slug}')
     context = {
         'post': post,
         'post_count': post_count,
         'post_author': author,
         'form_comment': form_comment,
         'comments': comments,
+        'comments_cursor': comments_cursor,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@replica_reads
+@anonymous_cache(POST_PAGE_CACHE_TIMEOUT)
+def post_comments(request, post_id):
+    if not Post.objects.visible().filter(pk=post_id).exists():
+        raise Http404
+    comments, comments_cursor = comment_page(
+        post_id, request.GET.get('cursor')
+    )
+    add_surrogate_keys(request, f'post:{post_id}', f'comments:{post_id}')
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+        'comments_cursor': comments_cursor,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@replica_reads
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.SearchResults(query), NUMBER_OF_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
+            thumbnails.enqueue(post)
         return redirect('posts:profile', username=request.user)
     context = {'form': form}
     return render(request, 'posts/create_post.html', context)
@@ -91,7 +211,10 @@ def post_edit(request, post_id):
         instance=post,
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
+            if 'image' in form.changed_data:
+                thumbnails.enqueue(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {'form': form, 'is_edit': True}
     return render(request, 'posts/create_post.html', context)
@@ -99,22 +222,28 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.visible(), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
+    posts = Post.objects.for_feed().filter(
         author__following__user=request.user
-    ).select_related('author')
-    page_obj = paginator_method(request, posts, NUMBER_OF_POSTS)
+    )
+    page_obj = paginator_method(
+        request,
+        posts,
+        NUMBER_OF_POSTS,
+        partial(TimelinePaginator, user=request.user),
+    )
     template = 'posts/follow.html'
     context = {'page_obj': page_obj}
     return render(request, template, context)
@@ -123,20 +252,18 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(
-        user=request.user,
-        author=author
-    )
-    if (not following) and (request.user != author):
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).delete()
+    with transaction.atomic():
+        Follow.objects.filter(
+            user=request.user,
+            author=author
+        ).delete()
     return redirect('posts:profile', username=username)
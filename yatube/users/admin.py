@@ -0,0 +1,34 @@
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+
+from posts import deletion
+
+User = get_user_model()
+
+
+class DeferredDeletionUserAdmin(UserAdmin):
+    """Удаление пользователей только через фоновую очередь: обычное
+    каскадное удаление грузит в память всю историю пользователя."""
+
+    actions = ('schedule_deletion',)
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def schedule_deletion(self, request, queryset):
+        scheduled = 0
+        for user in queryset.exclude(pk=request.user.pk):
+            deletion.schedule(user)
+            scheduled += 1
+        self.message_user(
+            request,
+            f'Поставлено в очередь на удаление: {scheduled}',
+            messages.SUCCESS,
+        )
+
+    schedule_deletion.short_description = 'Удалить в фоне'
+
+
+admin.site.unregister(User)
+admin.site.register(User, DeferredDeletionUserAdmin)
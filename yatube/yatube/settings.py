@@ -1,4 +1,6 @@
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,6 +49,8 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.db_router.ReplicaMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -83,11 +87,44 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 20000,
+                'mmap_size': 256 * 1024 * 1024,
+                # Отрицательное значение — размер в КиБ, а не в страницах.
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
     }
 }
 
+# Реплики для чтения: пути к копиям базы через запятую. Локально их
+# заполняет manage.py sync_replicas.
+REPLICA_DATABASES = []
+for number, name in enumerate(
+    filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи читать с основной базы.
+REPLICA_STICKY_SECONDS = 10
+# Сколько живут в общих кэшах данные, прочитанные с реплики: она может
+# отставать, поэтому такие записи истекают быстро.
+REPLICA_CACHE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -133,15 +170,76 @@ LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
 NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
 CHARACTERS = 15
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+PAGE_CACHE_TIMEOUT = 60 * 10
+POST_PAGE_CACHE_TIMEOUT = 60 * 60
+# Блокировка индекса surrogate-ключа: срок жизни и сколько её ждать.
+PAGE_CACHE_LOCK_TIMEOUT = 5
+PAGE_CACHE_LOCK_WAIT = 1
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_CACHE_TIMEOUT = 60 * 5
+FEED_CACHE_STALE_TIMEOUT = 60
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_LOCAL_CACHE_SIZE = 256
+FEED_LOCAL_CACHE_TIMEOUT = 5
+# Как часто процесс сбрасывает накопленные счётчики в общий кэш.
+METRICS_FLUSH_INTERVAL = 10
+
+# Варианты картинки поста, которые готовит process_thumbnails: каждая
+# ширина в каждом формате, с пропорциями POST_IMAGE_CROP. Последний
+# формат — запасной для <img>, остальные идут в <source>.
+POST_IMAGE_CROP = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_DEFAULT_WIDTH = 960
+POST_IMAGE_SIZES = '(min-width: 768px) 720px, 100vw'
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+# Для PNG, GIF и WebP: их нельзя декодировать сразу уменьшенными.
+POST_IMAGE_MAX_DECODED_PIXELS = 4 * 10 ** 6
+POST_IMAGE_QUALITY = 85
+# Сколько секунд не удалять файл картинки после его последней записи.
+MEDIA_BLOB_GRACE_PERIOD = 60 * 60
+
+# Загрузки больше этого размера сразу пишутся во временный файл.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+THUMBNAIL_WORKER_BATCH_SIZE = 20
+THUMBNAIL_WORKER_INTERVAL = 5
+THUMBNAIL_MAX_ATTEMPTS = 3
+
+# Фоновое удаление пользователей: строк за транзакцию и пауза воркера.
+USER_DELETION_BATCH_SIZE = 500
+USER_DELETION_INTERVAL = 5
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# Тесты (manage.py test и pytest) чистят кэш в setUp, поэтому работают
+# с отдельным файлом во временном каталоге, а не с рабочим кэшем.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['default']['LOCATION'] = os.path.join(
+        tempfile.gettempdir(), 'yatube-test-cache.sqlite3'
+    )
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+TIMELINE_MAX_ENTRIES = 1000
+TIMELINE_BATCH_SIZE = 500
+TIMELINE_FANOUT_THRESHOLD = 10000
+
+# Дальше этого числа строк админка не считает отфильтрованный список.
+ADMIN_COUNT_LIMIT = 10000